@@ -0,0 +1,299 @@
+import json
+import calendar
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import event, func, case, and_, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+from database import db, pin_to_primary
+from models import ApprenticeRecord, TrendMonth, STATUS_OPTIONS
+from queries import (within_window_clause, days_between, month_bucket, combined_records, record_source,
+                     filter_records, dashboard_metrics)
+from snapshot import snapshot_enabled, current_snapshot
+from versioning import data_version, locked_version
+from cache import cache
+
+GRADES = ['Distinction', 'Merit', 'Pass', 'Fail']
+
+# Pipeline stage durations: (name, start field, end field)
+STAGE_DURATIONS = [
+    ('gateway_to_approval', 'gateway_submitted', 'approved_for_epa'),
+    ('approval_to_first_attempt', 'approved_for_epa', 'first_attempt_date'),
+    ('approval_to_grade', 'approved_for_epa', 'grade_date'),
+]
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def init_analytics(app):
+    """Register the write hooks that keep cached analytics in step with the records."""
+    if not event.contains(Session, 'before_flush', _invalidate_touched_months):
+        event.listen(Session, 'before_flush', _invalidate_touched_months)
+        event.listen(Session, 'do_orm_execute', _invalidate_on_bulk_write)
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def group_percentiles(query, group_expr, value_expr, fractions):
+    """Return {group: [percentile for each fraction]} of value_expr over query.
+
+    Uses percentile_cont on PostgreSQL. Other backends fetch the values and use
+    NumPy's linear interpolation, which matches percentile_cont.
+    """
+    query = query.order_by(None).filter(value_expr.isnot(None))
+
+    if query.session.get_bind(clause=query.statement).dialect.name == 'postgresql':
+        columns = [func.percentile_cont(f).within_group(value_expr) for f in fractions]
+        if group_expr is None:
+            row = query.with_entities(*columns).one()
+            return {None: [float(v) for v in row]} if row[0] is not None else {}
+        rows = query.with_entities(group_expr, *columns).group_by(group_expr).all()
+        return {row[0]: [float(v) for v in row[1:]] for row in rows}
+
+    if group_expr is None:
+        rows = [(None, value) for (value,) in query.with_entities(value_expr).all()]
+    else:
+        rows = query.with_entities(group_expr, value_expr).all()
+    groups = {}
+    for group, value in rows:
+        groups.setdefault(group, []).append(value)
+    return {
+        group: [float(v) for v in np.percentile(np.asarray(values, dtype=float),
+                                                 [f * 100 for f in fractions])]
+        for group, values in groups.items()
+    }
+
+
+def cached_dashboard(args):
+    """Return (metrics, active filters) for the dashboard scoped by the /records filter args.
+
+    Metrics cover live and archived records and are cached in the dashboard
+    namespace until the records data version changes.
+    """
+    def compute():
+        if snapshot_enabled():
+            snapshot = current_snapshot()
+            mask, active_filters = snapshot.filter_mask(args)
+            return snapshot.dashboard_metrics(mask), active_filters
+        model, query = record_source(include_archived=True)
+        query, active_filters = filter_records(query, args, model)
+        return dashboard_metrics(query, model), active_filters
+
+    return cache.get_or_set('dashboard', f'metrics:{sorted(args.items())}', compute)
+
+
+def pipeline_analytics(query, active_filters, model=ApprenticeRecord, snapshot=None, mask=None):
+    """Return the status funnel and stage-duration percentiles for the records in query.
+
+    When a record snapshot and filter mask are given they are used instead of query.
+    Results are cached in the analytics namespace until the records data version changes.
+    """
+    def compute():
+        version, _ = data_version('records')
+        if snapshot is not None:
+            return _compute_pipeline_from_snapshot(snapshot, mask, active_filters, version)
+        return _compute_pipeline(query, active_filters, version, model)
+
+    return cache.get_or_set('analytics', f'pipeline:{sorted(active_filters.items())}', compute)
+
+
+def _funnel(counts):
+    total = sum(counts.values())
+    stages = STATUS_OPTIONS + [s for s in counts if s not in STATUS_OPTIONS and s is not None]
+    if None in counts:
+        stages.append(None)
+    return total, [
+        {
+            'status': status or 'Not set',
+            'count': counts.get(status, 0),
+            'pct': round(counts.get(status, 0) / total * 100, 1) if total else 0
+        }
+        for status in stages
+    ]
+
+
+def _duration_entry(count, values):
+    return {
+        'count': count,
+        **{f'p{int(f * 100)}': round(v, 1) if values else None
+           for f, v in zip(PERCENTILES, values or [None] * len(PERCENTILES))}
+    }
+
+
+def _compute_pipeline(query, active_filters, version, model):
+    counts = dict(
+        query.order_by(None).with_entities(model.status, func.count(model.id)).group_by(model.status).all()
+    )
+    total, funnel = _funnel(counts)
+
+    durations = {}
+    for name, start_field, end_field in STAGE_DURATIONS:
+        start, end = getattr(model, start_field), getattr(model, end_field)
+        stage_query = query.filter(start.isnot(None), end.isnot(None))
+        values = group_percentiles(stage_query, None, days_between(end, start), PERCENTILES).get(None)
+        durations[name] = _duration_entry(stage_query.order_by(None).count(), values)
+
+    return {
+        'filters': active_filters,
+        'total': total,
+        'funnel': funnel,
+        'durations_days': durations,
+        'data_version': version,
+    }
+
+
+def _compute_pipeline_from_snapshot(snapshot, mask, active_filters, version):
+    total, funnel = _funnel(snapshot.category_counts('status', mask))
+
+    durations = {}
+    for name, start_field, end_field in STAGE_DURATIONS:
+        days = snapshot.days_between(end_field, start_field, mask)
+        values = [float(v) for v in np.percentile(days, [f * 100 for f in PERCENTILES])] if len(days) else None
+        durations[name] = _duration_entry(len(days), values)
+
+    return {
+        'filters': active_filters,
+        'total': total,
+        'funnel': funnel,
+        'durations_days': durations,
+        'data_version': version,
+    }
+
+
+def _month_range(first, last):
+    """List 'YYYY-MM' strings from first to last inclusive."""
+    months = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _compute_months(months):
+    """Compute trend figures for the given months with one GROUP BY query."""
+    model = combined_records()
+    bucket = month_bucket(model.approved_for_epa)
+    first = datetime.strptime(months[0], '%Y-%m').date()
+    query = db.session.query(model).filter(model.approved_for_epa >= first, bucket.in_(months))
+
+    graded = and_(model.overall_grade.isnot(None), model.overall_grade != '')
+    has_window = and_(model.grade_date.isnot(None), model.approved_for_epa.isnot(None))
+    rows = query.with_entities(
+        bucket,
+        func.count(model.id),
+        _count_if(graded),
+        *[_count_if(model.overall_grade == grade) for grade in GRADES],
+        _count_if(has_window),
+        _count_if(within_window_clause(model)),
+    ).group_by(bucket).all()
+
+    medians = group_percentiles(
+        query, bucket, days_between(model.grade_date, model.approved_for_epa), [0.5]
+    )
+
+    results = {month: _trend_entry(month, 0, 0, [0] * len(GRADES), 0, 0, None) for month in months}
+    for month, learners, total_graded, *rest in rows:
+        grade_counts, (window_count, within_count) = rest[:len(GRADES)], rest[len(GRADES):]
+        median = medians.get(month, [None])[0]
+        results[month] = _trend_entry(month, learners, total_graded, grade_counts,
+                                      window_count, within_count, median)
+    return results
+
+
+def _trend_entry(month, learners, total_graded, grade_counts, window_count, within_count, median):
+    def pct(part, whole):
+        return round(part / whole * 100, 1) if whole else None
+
+    passed = sum(grade_counts[:3])  # Distinction + Merit + Pass
+    year, month_number = (int(part) for part in month.split('-'))
+    return {
+        'month': month,
+        'start': f'{month}-01',
+        'end': f'{month}-{calendar.monthrange(year, month_number)[1]:02d}',
+        'learners': learners,
+        'graded': total_graded,
+        'pass_rate': pct(passed, total_graded),
+        'grade_mix': {grade.lower(): pct(count, total_graded) for grade, count in zip(GRADES, grade_counts)},
+        'within_window_pct': pct(within_count, window_count),
+        'median_days_to_grade': round(median, 1) if median is not None else None,
+    }
+
+
+def monthly_trends():
+    """Return cohort trend figures per month of approved_for_epa, oldest first.
+
+    Closed months are cached in the trend_months table and only recomputed when
+    a record in that month is written; the current month is always recomputed.
+    Figures are only stored if no record was written while they were computed.
+    """
+    model = combined_records()
+    first, last = db.session.query(
+        func.min(model.approved_for_epa), func.max(model.approved_for_epa)
+    ).one()
+    if first is None:
+        return []
+
+    months = _month_range(first, last)
+    current_month = date.today().strftime('%Y-%m')
+    cached = {
+        row.month: json.loads(row.payload)
+        for row in TrendMonth.query.filter(TrendMonth.month.in_(months)).all()
+    }
+
+    missing = [m for m in months if m not in cached]
+    if missing:
+        # A lagging replica would otherwise have its figures cached on the primary for good
+        pin_to_primary()
+        version = data_version('records')[0]
+        computed = _compute_months(missing)
+        cached.update(computed)
+        closed = [m for m in missing if m < current_month]
+        if closed:
+            try:
+                for month in closed:
+                    db.session.add(TrendMonth(month=month, payload=json.dumps(computed[month]),
+                                              computed_at=datetime.now()))
+                db.session.flush()
+                # Writers take this lock before dropping their months, so either they
+                # committed first and the version moved on (the figures may predate them
+                # and are not kept), or they wait and drop these rows themselves
+                if locked_version(db.session, 'records') == version:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+            except IntegrityError:
+                # Another worker cached the same month first
+                db.session.rollback()
+
+    return [cached[m] for m in months]
+
+
+def _months_of(record):
+    """Months affected by a pending change to record (old and new approval dates)."""
+    history = attributes.get_history(record, 'approved_for_epa')
+    values = list(history.added or ()) + list(history.unchanged or ()) + list(history.deleted or ())
+    return {v.strftime('%Y-%m') for v in values if v is not None}
+
+
+def _invalidate_touched_months(session, flush_context, instances):
+    months = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ApprenticeRecord) and (obj not in session.dirty or session.is_modified(obj)):
+            months |= _months_of(obj)
+    if months:
+        # Ordered against monthly_trends storing these months; see there
+        locked_version(session, 'records')
+        session.connection().execute(
+            delete(TrendMonth.__table__).where(TrendMonth.__table__.c.month.in_(months))
+        )
+
+
+def _invalidate_on_bulk_write(orm_execute_state):
+    # Bulk UPDATE/DELETE statements bypass the flush, so drop every cached month
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ is ApprenticeRecord for mapper in orm_execute_state.all_mappers):
+        locked_version(orm_execute_state.session, 'records')
+        orm_execute_state.session.connection().execute(delete(TrendMonth.__table__))
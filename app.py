@@ -1,19 +1,36 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_mail import Mail, Message
-from database import db, init_db
-from models import ApprenticeRecord, User
-from datetime import datetime, timedelta
+from database import db, init_db, use_replica
+from passwords import init_passwords, is_strong_password
+from migrations import init_migrations
+from cache import cache, init_cache
+from http_cache import init_http_cache, conditional
+from ratelimit import init_ratelimit, rate_limited
+from assets import init_assets
+from fragments import init_fragments
+from profiling import init_profiling
+from queries import (parse_date, filter_records, at_risk_records, bulk_update_records,
+                     record_source, DATE_FILTERS)
+from versioning import init_versioning
+from analytics import init_analytics, cached_dashboard, monthly_trends, pipeline_analytics
+from snapshot import init_snapshot, snapshot_enabled, current_snapshot
+from digest import init_digest
+from archive import init_archive
+from maintenance import init_maintenance, queue_dashboard_warm
+from loadtest import init_loadtest
+from offload import init_offload, queue_email, queue_emails, render_in_pool
+from user_import import init_user_import, read_user_rows, import_users, activation_messages
+from exports import (init_exports, EXPORT_HEADERS, PARTITION_KEYS, FILE_BUILDERS, export_row, partition_key, build_csv,
+                     build_xlsx, build_pdf, stream_parquet, stream_arrow, stream_partitioned_zip)
+from metrics import init_metrics, track_export, track_email, IMPORT_DURATION, IMPORT_ROWS
+from models import ApprenticeRecord, ArchivedApprenticeRecord, User, STATUS_OPTIONS
+from datetime import datetime
+from sqlalchemy.orm import make_transient_to_detached
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-import csv
-import io
+import time
 import pandas as pd
-from openpyxl import Workbook
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
 from functools import wraps
 
 def admin_required(f):
@@ -28,20 +45,6 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Status options for dropdown
-STATUS_OPTIONS = [
-    'In Training',
-    'Gateway in Progress',
-    'Gateway Evidence Complete',
-    'Gateway Submitted',
-    'Denied EPA',
-    'Approved for EPA',
-    'EPA in Progress',
-    'EPA Evidence Complete',
-    'EPA Failed',
-    'EPA Passed'
-]
-
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'da11-tracker-secret-key-change-in-production')
 
@@ -54,31 +57,73 @@ app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_USERNAME', ''))
 
 # Initialize extensions
+init_passwords(app)
 init_db(app)
+init_migrations(app)
 mail = Mail(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'Please log in to access this page.'
 login_manager.login_message_category = 'info'
+init_digest(app, mail)
+init_archive(app)
+init_maintenance(app)
+init_loadtest(app)
+init_exports(app)
+init_offload(app)
+init_user_import(app)
+init_profiling(app)
+init_metrics(app)
+init_versioning(app)
+init_cache(app)
+init_ratelimit(app)
+init_analytics(app)
+init_snapshot(app)
+init_http_cache(app)
+init_assets(app)
+init_fragments(app)
 
 # Token serializer for password reset
 serializer = URLSafeTimedSerializer(app.secret_key)
 
 
+def send_email(msg):
+    """Send an email through Flask-Mail, recording latency and failures."""
+    with track_email():
+        mail.send(msg)
+
+
 @app.context_processor
 def utility_processor():
     def get_pending_registration_count():
-        return User.query.filter_by(approval_status='pending').count()
+        return cache.get_or_set('registrations', 'pending_count',
+                                lambda: User.query.filter_by(approval_status='pending').count())
     return dict(get_pending_registration_count=get_pending_registration_count)
 
 
+# User columns kept in the shared cache for load_user. Password hashes and tokens are
+# left out and load from the database if a request touches them.
+CACHED_USER_FIELDS = ['id', 'username', 'email', 'forename', 'surname', 'job_title', 'telephone', 'role',
+                      'is_active', 'approval_status', 'user_created_date', 'date_last_logged_in',
+                      'deleted_account_date']
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login."""
-    return User.query.get(int(user_id))
+    """Load user by ID for Flask-Login, from the cache while no user has changed."""
+    fields = cache.get('users', f'user:{user_id}')
+    if fields is not None:
+        user = User(**fields)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = User.query.get(int(user_id))
+    if user is not None:
+        cache.set('users', f'user:{user_id}', {field: getattr(user, field) for field in CACHED_USER_FIELDS})
+    return user
 
 
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limited(account=lambda: request.form.get('username'), template='login.html')
 def login():
     """Handle user login."""
     if current_user.is_authenticated:
@@ -100,6 +145,10 @@ def login():
                 flash('Account not activated. Please check your email or use "Forgot password" to reactivate.', 'danger')
                 return render_template('login.html')
 
+            # Upgrade hashes made with older settings while the plain password is at hand
+            if user.password_needs_rehash():
+                user.set_password(password)
+
             # Update last login timestamp
             user.date_last_logged_in = datetime.now()
             db.session.commit()
@@ -124,6 +173,7 @@ def logout():
 
 
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limited(account=lambda: request.form.get('email'), template='forgot_password.html')
 def forgot_password():
     """Handle forgot password request."""
     if current_user.is_authenticated:
@@ -163,9 +213,10 @@ If you did not make this request, please ignore this email.
 Best regards,
 DA1.1 Tracker Team
 '''
+            # Only an inline send (when the email queue is full) can fail here
             try:
-                mail.send(msg)
-                flash('A password reset link has been sent to your email address.', 'success')
+                queue_email(msg)
+                flash('A password reset link is on its way to your email address.', 'success')
             except Exception as e:
                 flash('Error sending email. Please contact the administrator.', 'danger')
                 print(f"Email error: {e}")
@@ -254,6 +305,7 @@ def update_profile():
 
 @app.route('/profile/change-password', methods=['POST'])
 @login_required
+@rate_limited(account=lambda: str(current_user.id))
 def change_password():
     """Change user password."""
     try:
@@ -313,7 +365,7 @@ Best regards,
 DA1.1 Tracker Team
 '''
         try:
-            mail.send(msg)
+            send_email(msg)
         except Exception as e:
             print(f"Email error: {e}")
 
@@ -326,6 +378,7 @@ DA1.1 Tracker Team
 
 
 @app.route('/register', methods=['POST'])
+@rate_limited(account=lambda: request.form.get('email'))
 def register():
     """Handle user registration."""
     if current_user.is_authenticated:
@@ -349,9 +402,7 @@ def register():
             return jsonify({'success': False, 'message': 'Email address already registered.'}), 400
 
         # Validate password strength (server-side)
-        import re
-        password_pattern = r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&#])[A-Za-z\d@$!%*?&#]{8,}$'
-        if not re.match(password_pattern, password):
+        if not is_strong_password(password):
             return jsonify({'success': False, 'message': 'Password does not meet security requirements.'}), 400
 
         # Create username from email (before @)
@@ -394,6 +445,7 @@ def register():
 @app.route('/admin/notifications')
 @login_required
 @admin_required
+@conditional('users')
 def get_notifications():
     """Return pending registration requests as JSON."""
     pending_users = User.query.filter_by(approval_status='pending').order_by(User.user_created_date.desc()).all()
@@ -433,12 +485,14 @@ def approve_registration(user_id):
     msg = Message('Activate Your DA1.1 Tracker Account', recipients=[user.email])
     msg.html = render_template('emails/activation.html', forename=user.forename, activation_url=activation_url)
     msg.body = render_template('emails/activation.txt', forename=user.forename, activation_url=activation_url)
+    # Only an inline send (when the email queue is full) can fail here
     try:
-        mail.send(msg)
+        queue_email(msg)
     except Exception as e:
         print(f"Email error: {e}")
+        return jsonify({'success': True, 'message': 'Approved, but the activation email could not be sent.'}), 200
 
-    return jsonify({'success': True, 'message': 'Approved. Activation email sent.'}), 200
+    return jsonify({'success': True, 'message': 'Approved. Activation email queued.'}), 200
 
 
 @app.route('/admin/notifications/reject/<int:user_id>', methods=['POST'])
@@ -458,17 +512,20 @@ def reject_registration(user_id):
     msg = Message('DA1.1 Tracker \u2014 Registration Request', recipients=[user.email])
     msg.html = render_template('emails/rejection.html', forename=user.forename)
     msg.body = render_template('emails/rejection.txt', forename=user.forename)
+    # Only an inline send (when the email queue is full) can fail here
     try:
-        mail.send(msg)
+        queue_email(msg)
     except Exception as e:
         print(f"Email error: {e}")
+        return jsonify({'success': True, 'message': 'Rejected, but the notification could not be sent.'}), 200
 
-    return jsonify({'success': True, 'message': 'Rejected. Notification sent.'}), 200
+    return jsonify({'success': True, 'message': 'Rejected. Notification queued.'}), 200
 
 
 @app.route('/admin/users')
 @login_required
 @admin_required
+@conditional('users')
 def get_users():
     """Return all active users as JSON."""
     users = User.query.filter(User.deleted_account_date.is_(None)).order_by(User.surname).all()
@@ -545,6 +602,38 @@ def delete_user(user_id):
     return jsonify({'success': True, 'message': 'User deleted successfully.'}), 200
 
 
+@app.route('/admin/users/import', methods=['POST'])
+@login_required
+@admin_required
+def import_users_upload():
+    """Create approved accounts from a CSV or XLSX of users and queue their activation emails."""
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'success': False, 'message': 'No file selected.'}), 400
+
+    filename = file.filename.lower()
+    if not (filename.endswith('.csv') or filename.endswith('.xlsx')):
+        return jsonify({'success': False, 'message': 'Invalid file type. Please upload a CSV or XLSX file.'}), 400
+
+    try:
+        df = pd.read_csv(file, dtype=str) if filename.endswith('.csv') else pd.read_excel(file, dtype=str)
+        rows, errors = read_user_rows(df)
+        users, import_errors = import_users(rows, serializer, app.config['USER_IMPORT_WORKERS'])
+        errors += import_errors
+        queue_emails(activation_messages(users))
+    except Exception as e:
+        db.session.rollback()
+        print(f"User import error: {e}")
+        return jsonify({'success': False, 'message': 'An error occurred while importing users.'}), 500
+
+    return jsonify({
+        'success': True,
+        'message': f'Import complete: {len(users)} user(s) created, {len(errors)} skipped. Activation emails are being sent.',
+        'created': len(users),
+        'errors': errors
+    }), 200
+
+
 @app.route('/activate/<token>')
 def activate_account(token):
     """Handle account activation from email link."""
@@ -578,209 +667,168 @@ def activate_account(token):
     return render_template('activation_success.html')
 
 
-def count_business_days(start_date, end_date):
-    """Count business days (excluding weekends) between two dates."""
-    if not start_date or not end_date:
-        return None
-    if end_date < start_date:
-        return 0
-    count = 0
-    current = start_date
-    while current <= end_date:
-        if current.weekday() < 5:  # Monday = 0, Friday = 4
-            count += 1
-        current += timedelta(days=1)
-    return count
-
-
-def parse_date(date_string):
-    """Parse date string to date object, return None if empty or invalid."""
-    if not date_string:
-        return None
-    try:
-        return datetime.strptime(date_string, '%Y-%m-%d').date()
-    except ValueError:
-        return None
-
-
 @app.route('/')
+@use_replica
 @login_required
+@conditional('records', 'users')
 def index():
-    """Display dashboard with metrics."""
-    records = ApprenticeRecord.query.all()
-
-    total_learners = len(records)
-
-    # Grade distribution
-    graded_records = [r for r in records if r.overall_grade]
-    total_graded = len(graded_records)
-
-    if total_graded > 0:
-        distinction_count = sum(1 for r in graded_records if r.overall_grade == 'Distinction')
-        merit_count = sum(1 for r in graded_records if r.overall_grade == 'Merit')
-        pass_count = sum(1 for r in graded_records if r.overall_grade == 'Pass')
-        fail_count = sum(1 for r in graded_records if r.overall_grade == 'Fail')
-
-        grade_dist = {
-            'distinction': round(distinction_count / total_graded * 100, 1),
-            'merit': round(merit_count / total_graded * 100, 1),
-            'pass': round(pass_count / total_graded * 100, 1),
-            'fail': round(fail_count / total_graded * 100, 1)
-        }
-
-        # Overall pass rate (Distinction + Merit + Pass)
-        passed = distinction_count + merit_count + pass_count
-        pass_rate = round(passed / total_graded * 100, 1)
-    else:
-        grade_dist = {'distinction': 0, 'merit': 0, 'pass': 0, 'fail': 0}
-        pass_rate = 0
-
-    # Within 12-week window percentage
-    records_with_window = [r for r in records if r.within_epa_window is not None]
-    if records_with_window:
-        within_window = sum(1 for r in records_with_window if r.within_epa_window == 'Yes')
-        within_window_pct = round(within_window / len(records_with_window) * 100, 1)
-    else:
-        within_window_pct = 0
-
-    # First attempts booked within 12-week EPA window
-    records_with_first_attempt = [r for r in records if r.first_attempt_date and r.approved_for_epa]
-    if records_with_first_attempt:
-        first_in_window = sum(1 for r in records_with_first_attempt
-                             if (r.first_attempt_date - r.approved_for_epa).days <= 84)
-        first_attempt_in_window_pct = round(first_in_window / len(records_with_first_attempt) * 100, 1)
-    else:
-        first_attempt_in_window_pct = 0
-
-    # Average days to complete for those within 12 weeks (as percentage of 84-day window)
-    within_window_records = [r for r in records if r.within_epa_window == 'Yes'
-                            and r.grade_date and r.approved_for_epa]
-    if within_window_records:
-        total_days = sum((r.grade_date - r.approved_for_epa).days for r in within_window_records)
-        avg_days = total_days / len(within_window_records)
-        avg_days_within_window = round(avg_days / 84 * 100, 1)
-    else:
-        avg_days_within_window = 0
-
-    # Beyond 12-week window percentage
-    beyond_window_pct = round(100 - within_window_pct, 1)
-
-    # Gateway approval within 5 working days
-    records_with_gateway = [r for r in records if r.gateway_submitted and r.approved_for_epa]
-    if records_with_gateway:
-        approved_within_5_days = sum(
-            1 for r in records_with_gateway
-            if count_business_days(r.gateway_submitted, r.approved_for_epa) <= 5
-        )
-        gateway_approval_pct = round(approved_within_5_days / len(records_with_gateway) * 100, 1)
-    else:
-        gateway_approval_pct = 0
-
-    metrics = {
-        'total_learners': total_learners,
-        'grade_dist': grade_dist,
-        'pass_rate': pass_rate,
-        'within_window_pct': within_window_pct,
-        'beyond_window_pct': beyond_window_pct,
-        'first_attempt_in_window_pct': first_attempt_in_window_pct,
-        'avg_days_within_window': avg_days_within_window,
-        'gateway_approval_pct': gateway_approval_pct
-    }
-
-    return render_template('dashboard.html', metrics=metrics)
+    """Display dashboard with metrics, optionally scoped by the /records filters."""
+    metrics, active_filters = cached_dashboard(request.args)
+    return render_template('dashboard.html', metrics=metrics, active_filters=active_filters)
 
 
 @app.route('/records')
+@use_replica
 @login_required
+@conditional('records', 'users')
 def records():
     """Display all apprentice records with filtering and pagination support."""
-    query = ApprenticeRecord.query
+    include_archived = request.args.get('include_archived') == '1'
+    model, query = record_source(include_archived)
+    query, active_filters = filter_records(query, request.args, model)
+    if include_archived:
+        active_filters['include_archived'] = '1'
+
+    # Jump straight to the record when an ACE360 ID search finds exactly one
+    if 'ace360_id' in active_filters:
+        matches = query.order_by(None).with_entities(model.id).limit(2).all()
+        if len(matches) == 1:
+            return redirect(url_for('view_record', id=matches[0][0]))
 
-    # Collect all active filters for template
-    active_filters = {}
+    # Get page number from query params
+    page = request.args.get('page', 1, type=int)
+    per_page = 20
 
-    # Status filter
-    status_filter = request.args.get('status')
-    if status_filter:
-        query = query.filter(ApprenticeRecord.status == status_filter)
-        active_filters['status'] = status_filter
-
-    # Grade filter
-    grade_filter = request.args.get('grade')
-    if grade_filter:
-        query = query.filter(ApprenticeRecord.overall_grade == grade_filter)
-        active_filters['grade'] = grade_filter
-
-    # Within EPA Window filter (handled in Python since it's a computed property)
-    window_filter = request.args.get('window')
-    if window_filter:
-        active_filters['window'] = window_filter
-
-    # Date range filters
-    date_filters = [
-        ('gateway', 'gateway_submitted'),
-        ('approved', 'approved_for_epa'),
-        ('project_start', 'project_start_date'),
-        ('deadline', 'project_deadline_date'),
-        ('first_attempt', 'first_attempt_date'),
-        ('second_attempt', 'second_attempt_date'),
-        ('grade_date', 'grade_date'),
-    ]
+    pagination_obj = query.order_by(model.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    records_list = pagination_obj.items
+    archived_ids = set()
+    if include_archived and records_list:
+        archived_ids = {
+            rid for (rid,) in db.session.query(ArchivedApprenticeRecord.id)
+            .filter(ArchivedApprenticeRecord.id.in_([r.id for r in records_list])).all()
+        }
+    pagination = {
+        'page': pagination_obj.page,
+        'per_page': per_page,
+        'total': pagination_obj.total,
+        'pages': pagination_obj.pages,
+        'has_prev': pagination_obj.has_prev,
+        'has_next': pagination_obj.has_next,
+        'prev_num': pagination_obj.prev_num,
+        'next_num': pagination_obj.next_num
+    }
 
-    for filter_prefix, model_field in date_filters:
-        from_date = request.args.get(f'{filter_prefix}_from')
-        to_date = request.args.get(f'{filter_prefix}_to')
+    return render_template('index.html', records=records_list, active_filters=active_filters, pagination=pagination,
+                           status_options=STATUS_OPTIONS, include_archived=include_archived,
+                           archived_ids=archived_ids)
 
-        if from_date:
-            parsed_from = parse_date(from_date)
-            if parsed_from:
-                query = query.filter(getattr(ApprenticeRecord, model_field) >= parsed_from)
-                active_filters[f'{filter_prefix}_from'] = from_date
 
-        if to_date:
-            parsed_to = parse_date(to_date)
-            if parsed_to:
-                query = query.filter(getattr(ApprenticeRecord, model_field) <= parsed_to)
-                active_filters[f'{filter_prefix}_to'] = to_date
+@app.route('/api/records')
+@use_replica
+@login_required
+def records_data():
+    """Return apprentice records matching the /records filters (including ace360_id search) as JSON."""
+    include_archived = request.args.get('include_archived') == '1'
+    model, query = record_source(include_archived)
+    query, active_filters = filter_records(query, request.args, model)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    pagination_obj = query.order_by(model.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    return jsonify({
+        'filters': active_filters,
+        'page': pagination_obj.page,
+        'pages': pagination_obj.pages,
+        'total': pagination_obj.total,
+        'records': [{
+            'id': r.id,
+            'ace360_id': r.ace360_id,
+            'status': r.status,
+            'approved_for_epa': str(r.approved_for_epa) if r.approved_for_epa else None,
+            'overall_grade': r.overall_grade,
+            'grade_date': str(r.grade_date) if r.grade_date else None,
+            'url': url_for('view_record', id=r.id)
+        } for r in pagination_obj.items]
+    })
+
+
+@app.route('/trends')
+@use_replica
+@login_required
+def trends():
+    """Display monthly cohort trends by EPA approval month."""
+    return render_template('trends.html', trends=monthly_trends())
 
-    # Get page number from query params
+
+@app.route('/api/trends')
+@use_replica
+@login_required
+def trends_data():
+    """Return monthly cohort trends as JSON."""
+    return jsonify(monthly_trends())
+
+
+@app.route('/api/analytics/pipeline')
+@use_replica
+@login_required
+def pipeline_data():
+    """Return the status funnel and stage-duration percentiles as JSON, scoped by the /records filters."""
+    if snapshot_enabled():
+        snapshot = current_snapshot()
+        mask, active_filters = snapshot.filter_mask(request.args)
+        return jsonify(pipeline_analytics(None, active_filters, snapshot=snapshot, mask=mask))
+    model, query = record_source(include_archived=True)
+    query, active_filters = filter_records(query, request.args, model)
+    return jsonify(pipeline_analytics(query, active_filters, model))
+
+
+def get_worklist_params():
+    """Read the at-risk worklist threshold and overdue toggle from the query string."""
+    days = request.args.get('days', 14, type=int)
+    days = min(max(days, 0), 365)
+    include_overdue = request.args.get('include_overdue') in ('1', 'true', 'on')
+    return days, include_overdue
+
+
+@app.route('/worklist')
+@use_replica
+@login_required
+def worklist():
+    """Display ungraded records approaching EPA window closure."""
+    days, include_overdue = get_worklist_params()
     page = request.args.get('page', 1, type=int)
-    per_page = 20
+    per_page = 50
+    pagination_obj = at_risk_records(days, include_overdue).paginate(page=page, per_page=per_page, error_out=False)
+    return render_template('worklist.html', records=pagination_obj.items, pagination=pagination_obj,
+                           days=days, include_overdue=include_overdue, today=datetime.now().date())
 
-    # Apply window filter requires fetching all and filtering in Python
-    if window_filter:
-        all_records = query.order_by(ApprenticeRecord.id.desc()).all()
-        filtered_records = [r for r in all_records if r.within_epa_window == window_filter]
-        total = len(filtered_records)
-        total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        records_list = filtered_records[start_idx:end_idx]
-        pagination = {
-            'page': page,
-            'per_page': per_page,
-            'total': total,
-            'pages': total_pages,
-            'has_prev': page > 1,
-            'has_next': page < total_pages,
-            'prev_num': page - 1 if page > 1 else None,
-            'next_num': page + 1 if page < total_pages else None
-        }
-    else:
-        pagination_obj = query.order_by(ApprenticeRecord.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
-        records_list = pagination_obj.items
-        pagination = {
-            'page': pagination_obj.page,
-            'per_page': per_page,
-            'total': pagination_obj.total,
-            'pages': pagination_obj.pages,
-            'has_prev': pagination_obj.has_prev,
-            'has_next': pagination_obj.has_next,
-            'prev_num': pagination_obj.prev_num,
-            'next_num': pagination_obj.next_num
-        }
 
-    return render_template('index.html', records=records_list, active_filters=active_filters, pagination=pagination)
+@app.route('/api/worklist')
+@use_replica
+@login_required
+def worklist_data():
+    """Return ungraded records approaching EPA window closure as JSON."""
+    days, include_overdue = get_worklist_params()
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 100)
+    today = datetime.now().date()
+
+    pagination_obj = at_risk_records(days, include_overdue).paginate(page=page, per_page=per_page, error_out=False)
+    return jsonify({
+        'days': days,
+        'include_overdue': include_overdue,
+        'page': pagination_obj.page,
+        'pages': pagination_obj.pages,
+        'total': pagination_obj.total,
+        'records': [{
+            'id': r.id,
+            'ace360_id': r.ace360_id,
+            'status': r.status,
+            'approved_for_epa': str(r.approved_for_epa),
+            'epa_window_closure': str(r.epa_window_closes),
+            'days_remaining': (r.epa_window_closes - today).days
+        } for r in pagination_obj.items]
+    })
 
 
 @app.route('/add', methods=['GET', 'POST'])
@@ -848,11 +896,16 @@ def delete_record(id):
 
 
 @app.route('/view/<int:id>')
+@use_replica
 @login_required
+@conditional('records', 'users')
 def view_record(id):
     """View a single apprentice record with all details."""
-    record = ApprenticeRecord.query.get_or_404(id)
-    return render_template('view.html', record=record)
+    record = db.session.get(ApprenticeRecord, id)
+    if record is None:
+        record = ArchivedApprenticeRecord.query.get_or_404(id)
+        return render_template('view.html', record=record, archived=True)
+    return render_template('view.html', record=record, archived=False)
 
 
 @app.route('/delete-bulk', methods=['POST'])
@@ -879,102 +932,215 @@ def delete_records_bulk():
     return redirect(url_for('records'))
 
 
-def get_export_data():
-    """Get all records formatted for export."""
-    records = ApprenticeRecord.query.order_by(ApprenticeRecord.id.desc()).all()
-    headers = ['ACE360 ID', 'Status', 'Gateway Submitted', 'EPA Ready Date', 'EPA Window Closure',
-               'Project Start Date', 'Project Deadline', 'First Attempt', 'Second Attempt',
-               'Variance (Days)', 'Overall Grade', 'Grade Date', 'EPA Completed within SLA']
-    rows = []
+GRADE_OPTIONS = ['Distinction', 'Merit', 'Pass', 'Fail']
+
+
+@app.route('/update-bulk', methods=['POST'])
+@login_required
+@admin_required
+def update_records_bulk():
+    """Apply status, grade or date changes to selected or filtered records in one UPDATE."""
+    wants_json = request.accept_mimetypes.best == 'application/json'
+
+    def fail(message):
+        if wants_json:
+            return jsonify({'success': False, 'message': message}), 400
+        flash(message, 'warning')
+        return redirect(url_for('records'))
+
+    # Update fields are prefixed with set_ so they never clash with filter parameters
+    values = {}
+    new_status = request.form.get('set_status')
+    if new_status:
+        if new_status not in STATUS_OPTIONS:
+            return fail('Invalid status specified.')
+        values['status'] = new_status
+
+    new_grade = request.form.get('set_overall_grade')
+    if new_grade:
+        if new_grade not in GRADE_OPTIONS:
+            return fail('Invalid grade specified.')
+        values['overall_grade'] = new_grade
+
+    for _, field in DATE_FILTERS:
+        raw = request.form.get(f'set_{field}')
+        if raw:
+            parsed = parse_date(raw)
+            if parsed is None:
+                return fail(f'Invalid date for {field}.')
+            values[field] = parsed
+
+    clearable = {'overall_grade'} | {field for _, field in DATE_FILTERS}
+    for field in request.form.getlist('clear_fields[]'):
+        if field in clearable and field not in values:
+            values[field] = None
+
+    if not values:
+        return fail('No changes specified.')
+
+    active_filters = {}
+    if request.form.get('scope') == 'filter':
+        # Archived records are read-only, so only live records matching the filters change
+        query, active_filters = filter_records(ApprenticeRecord.query, request.form)
+    else:
+        record_ids = request.form.getlist('record_ids[]')
+        if not record_ids:
+            return fail('No records selected for update.')
+        try:
+            ids_to_update = [int(rid) for rid in record_ids]
+        except ValueError:
+            return fail('Invalid record selection.')
+        query = ApprenticeRecord.query.filter(ApprenticeRecord.id.in_(ids_to_update))
+
+    try:
+        updated_count = bulk_update_records(query, values)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        if wants_json:
+            return jsonify({'success': False, 'message': f'Error updating records: {str(e)}'}), 500
+        flash(f'Error updating records: {str(e)}', 'danger')
+        return redirect(url_for('records', **active_filters))
+
+    message = f'{updated_count} record(s) updated successfully!'
+    if request.form.get('include_archived') == '1':
+        message += ' Archived records are not changed.'
+    if wants_json:
+        return jsonify({'success': True, 'updated': updated_count, 'message': message}), 200
+    flash(message, 'success')
+    return redirect(url_for('records', **active_filters))
+
+
+def get_export_data(partition_by=None):
+    """Get all records, live and archived, formatted for export.
+
+    With partition_by ('status' or 'month'), rows are grouped into a dict keyed by
+    partition name instead of returned as one list.
+    """
+    model, query = record_source(include_archived=True)
+    records = query.order_by(model.id.desc()).all()
+    headers = list(EXPORT_HEADERS)
+    if partition_by is None:
+        return headers, [export_row(r) for r in records]
+
+    partitions = {}
     for r in records:
-        rows.append([
-            r.ace360_id,
-            r.status if r.status else '',
-            str(r.gateway_submitted) if r.gateway_submitted else '',
-            str(r.approved_for_epa) if r.approved_for_epa else '',
-            r.epa_window_closure if r.epa_window_closure else '',
-            str(r.project_start_date) if r.project_start_date else '',
-            str(r.project_deadline_date) if r.project_deadline_date else '',
-            str(r.first_attempt_date) if r.first_attempt_date else '',
-            str(r.second_attempt_date) if r.second_attempt_date else '',
-            r.variance_days if r.variance_days is not None else '',
-            r.overall_grade if r.overall_grade else '',
-            str(r.grade_date) if r.grade_date else '',
-            r.within_epa_window if r.within_epa_window else ''
-        ])
-    return headers, rows
+        partitions.setdefault(partition_key(r, partition_by), []).append(export_row(r))
+    return headers, partitions
+
+
+def cached_export(fmt, builder, offload=False):
+    """Return (file contents, row count) for an export, reused until the records change.
+
+    With offload, the file is rendered in the export process pool instead of on this thread.
+    """
+    def build():
+        headers, rows = get_export_data()
+        output = render_in_pool(builder, headers, rows) if offload else builder(headers, rows)
+        return output, len(rows)
+    return cache.get_or_set('exports', fmt, build)
 
 
 @app.route('/export/csv')
+@use_replica
 @login_required
 def export_csv():
     """Export all records as CSV."""
-    headers, rows = get_export_data()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(headers)
-    writer.writerows(rows)
+    with track_export('csv') as add_rows:
+        output, row_count = cached_export('csv', build_csv)
+        add_rows(row_count)
     return Response(
-        output.getvalue(),
+        output,
         mimetype='text/csv',
         headers={'Content-Disposition': 'attachment; filename=apprentice_records.csv'}
     )
 
 
 @app.route('/export/xlsx')
+@use_replica
 @login_required
 def export_xlsx():
     """Export all records as Excel file."""
-    headers, rows = get_export_data()
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Apprentice Records'
-    ws.append(headers)
-    for row in rows:
-        ws.append(row)
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    with track_export('xlsx') as add_rows:
+        output, row_count = cached_export('xlsx', build_xlsx, offload=True)
+        add_rows(row_count)
     return Response(
-        output.getvalue(),
+        output,
         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
         headers={'Content-Disposition': 'attachment; filename=apprentice_records.xlsx'}
     )
 
 
 @app.route('/export/pdf')
+@use_replica
 @login_required
 def export_pdf():
     """Export all records as PDF."""
-    headers, rows = get_export_data()
-    output = io.BytesIO()
-    doc = SimpleDocTemplate(output, pagesize=landscape(letter))
-    styles = getSampleStyleSheet()
-    elements = []
-    elements.append(Paragraph('Apprentice Records: Data Analyst', styles['Title']))
-    table_data = [headers] + rows
-    table = Table(table_data)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#512eab')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    output.seek(0)
+    with track_export('pdf') as add_rows:
+        output, row_count = cached_export('pdf', build_pdf, offload=True)
+        add_rows(row_count)
     return Response(
-        output.getvalue(),
+        output,
         mimetype='application/pdf',
         headers={'Content-Disposition': 'attachment; filename=apprentice_records.pdf'}
     )
 
 
+@app.route('/export/zip')
+@use_replica
+@login_required
+def export_zip():
+    """Export one file per status or approval month, built in parallel and streamed as a ZIP."""
+    partition_by = request.args.get('partition_by', 'status')
+    fmt = request.args.get('format', 'xlsx')
+    if partition_by not in PARTITION_KEYS or fmt not in FILE_BUILDERS:
+        flash('Invalid ZIP export options', 'error')
+        return redirect(url_for('records'))
+
+    headers, partitions = get_export_data(partition_by)
+
+    def generate():
+        with track_export(f'zip_{fmt}') as add_rows:
+            yield from stream_partitioned_zip(headers, partitions, fmt, app.config['EXPORT_ZIP_WORKERS'])
+            add_rows(sum(len(rows) for rows in partitions.values()))
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=apprentice_records_by_{partition_by}_{fmt}.zip'}
+    )
+
+
+@app.route('/export/parquet')
+@use_replica
+@login_required
+def export_parquet():
+    """Export all records as a typed Parquet file, written one row group at a time."""
+    def generate():
+        with track_export('parquet') as add_rows:
+            yield from stream_parquet(add_rows)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/vnd.apache.parquet',
+        headers={'Content-Disposition': 'attachment; filename=apprentice_records.parquet'}
+    )
+
+
+@app.route('/export/arrow')
+@use_replica
+@login_required
+def export_arrow():
+    """Export all records as a typed Arrow IPC stream, written one record batch at a time."""
+    def generate():
+        with track_export('arrow') as add_rows:
+            yield from stream_arrow(add_rows)
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/vnd.apache.arrow.stream',
+        headers={'Content-Disposition': 'attachment; filename=apprentice_records.arrows'}
+    )
+
+
 @app.route('/upload', methods=['POST'])
 @login_required
 @admin_required
@@ -994,6 +1160,7 @@ def upload_records():
         flash('Invalid file type. Please upload a CSV or XLSX file.', 'error')
         return redirect(url_for('records'))
 
+    import_start = time.perf_counter()
     try:
         # Read file into pandas DataFrame
         if filename.endswith('.csv'):
@@ -1030,8 +1197,9 @@ def upload_records():
 
             ace360_id = int(ace360_id)
 
-            # Check if record already exists
-            existing = ApprenticeRecord.query.filter_by(ace360_id=ace360_id).first()
+            # Check if record already exists, archived ones included, or a re-upload would bring them back
+            existing = (ApprenticeRecord.query.filter_by(ace360_id=ace360_id).first()
+                        or ArchivedApprenticeRecord.query.filter_by(ace360_id=ace360_id).first())
             if existing:
                 skipped += 1
                 continue
@@ -1078,6 +1246,11 @@ def upload_records():
             imported += 1
 
         db.session.commit()
+        IMPORT_ROWS.labels(outcome='imported').inc(imported)
+        IMPORT_ROWS.labels(outcome='skipped').inc(skipped)
+        IMPORT_DURATION.observe(time.perf_counter() - import_start)
+        if imported:
+            queue_dashboard_warm(app)
         flash(f'Import complete: {imported} records imported, {skipped} skipped (existing or invalid).', 'success')
 
     except Exception as e:
@@ -0,0 +1,62 @@
+import os
+from datetime import date, datetime, timedelta
+import click
+from sqlalchemy import select, insert, delete, literal
+from database import db
+from models import ApprenticeRecord, ArchivedApprenticeRecord, CLOSED_STATUSES
+
+
+def init_archive(app):
+    """Register the archive-records CLI command."""
+    app.config.setdefault('ARCHIVE_AFTER_DAYS', int(os.environ.get('ARCHIVE_AFTER_DAYS', 365)))
+    app.config.setdefault('ARCHIVE_BATCH_SIZE', int(os.environ.get('ARCHIVE_BATCH_SIZE', 1000)))
+
+    @app.cli.command('archive-records')
+    @click.option('--older-than-days', type=int, default=None,
+                  help='Archive closed records graded more than this many days ago.')
+    @click.option('--batch-size', type=int, default=None, help='Records moved per transaction.')
+    def archive_records_command(older_than_days, batch_size):
+        """Move completed records out of the live table into the archive."""
+        older_than_days = older_than_days if older_than_days is not None else app.config['ARCHIVE_AFTER_DAYS']
+        batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+        cutoff = date.today() - timedelta(days=older_than_days)
+        moved = archive_closed_records(cutoff, batch_size)
+        print(f"Archive complete: {moved} record(s) graded before {cutoff} moved to the archive.")
+
+
+def archive_closed_records(cutoff, batch_size=1000):
+    """Move EPA Passed/Failed records graded before cutoff into the archive table.
+
+    Each batch is copied and deleted in its own transaction, so the job can be
+    stopped and rerun at any point. Returns the number of records moved.
+    """
+    live = ApprenticeRecord.__table__
+    columns = [column.name for column in live.columns]
+    moved = 0
+
+    while True:
+        ids = db.session.execute(
+            select(live.c.id)
+            .where(live.c.status.in_(CLOSED_STATUSES), live.c.grade_date < cutoff)
+            .order_by(live.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        db.session.execute(
+            insert(ArchivedApprenticeRecord).from_select(
+                columns + ['archived_at'],
+                select(*[live.c[name] for name in columns], literal(datetime.now()))
+                .where(live.c.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            delete(ApprenticeRecord).where(ApprenticeRecord.id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        moved += len(ids)
+        print(f"  {moved} record(s) archived...")
+
+    return moved
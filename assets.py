@@ -0,0 +1,112 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import mimetypes
+from flask import request, url_for, send_from_directory, abort
+from flask.sessions import SecureCookieSessionInterface
+from http_cache import COMPRESSIBLE_MIMETYPES, brotli
+
+# Built assets live here, named <name>.<content hash>.<ext>, with .gz/.br siblings
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class AssetSessionInterface(SecureCookieSessionInterface):
+    """Cookie sessions everywhere except /assets, so shared caches never see Vary: Cookie there."""
+
+    def open_session(self, app, request):
+        if request.path.startswith('/assets/'):
+            return None
+        return super().open_session(app, request)
+
+
+def init_assets(app):
+    """Register the asset_url template helper, the /assets route and the build-assets command."""
+    static_dir = app.static_folder
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    manifest = _load_manifest(dist_dir)
+
+    def asset_url(filename):
+        """URL of the fingerprinted build of a static file, or the plain static URL before a build."""
+        if filename in manifest:
+            return url_for('serve_asset', filename=manifest[filename])
+        return url_for('static', filename=filename)
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.session_interface = AssetSessionInterface()
+
+    @app.route('/assets/<path:filename>')
+    def serve_asset(filename):
+        """Serve a fingerprinted asset, pre-compressed when the client accepts it, cached forever."""
+        if filename not in manifest.values():
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        if brotli is not None and request.accept_encodings['br'] and os.path.exists(os.path.join(dist_dir, filename + '.br')):
+            encoding = 'br'
+        elif request.accept_encodings['gzip'] and os.path.exists(os.path.join(dist_dir, filename + '.gz')):
+            encoding = 'gzip'
+
+        served = filename + {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+        response = send_from_directory(dist_dir, served, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if mimetype in COMPRESSIBLE_MIMETYPES:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint and pre-compress every static file into static/dist."""
+        built = build_assets(static_dir)
+        manifest.clear()
+        manifest.update(built)
+        print(f"Built {len(built)} asset(s) into {dist_dir}.")
+
+
+def _load_manifest(dist_dir):
+    try:
+        with open(os.path.join(dist_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_assets(static_dir):
+    """Copy each static file to dist/<name>.<hash>.<ext> with .gz/.br variants and write the manifest."""
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != dist_dir)
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            stem, ext = os.path.splitext(logical)
+            hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(dist_dir, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+
+            if mimetypes.guess_type(name)[0] in COMPRESSIBLE_MIMETYPES:
+                with open(target + '.gz', 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    with open(target + '.br', 'wb') as f:
+                        f.write(brotli.compress(data, quality=11))
+            manifest[logical] = hashed
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
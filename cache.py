@@ -0,0 +1,255 @@
+import os
+import stat
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from flask import g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from database import db
+from models import DataVersion
+from metrics import CACHE_REQUESTS, CACHE_EVICTIONS
+
+# Namespaces whose entries depend on a data version (see versioning.py). The
+# versions are part of every key, so a committed write to ApprenticeRecord or User
+# in any worker makes the old entries unreachable; they then age out by TTL or size.
+NAMESPACE_DEPENDENCIES = {
+    'dashboard': ('records',),
+    'analytics': ('records',),
+    'exports': ('records',),
+    'users': ('users',),
+    'registrations': ('users',),
+}
+
+_MISSING = object()
+
+
+class LRUBackend:
+    """In-process store, evicting least recently used entries beyond max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            namespace, value, expires_at = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, namespace, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (namespace, value, time.time() + ttl)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                CACHE_EVICTIONS.inc()
+
+    def delete_namespace(self, namespace):
+        with self.lock:
+            for key in [k for k, entry in self.entries.items() if entry[0] == namespace]:
+                self._remove(key)
+
+    def _remove(self, key):
+        namespace, value, expires_at = self.entries.pop(key)
+        self.size -= len(value)
+
+
+def private_store(path):
+    """Prepare path for a store only this user can read or write, refusing one someone else controls.
+
+    The cache unpickles what it reads, so a file another local user can write
+    would let them run code in the app. The directory is created 0700 and must not
+    be writable by others; the file is created 0600 and must be owned by this user.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise RuntimeError(f"Refusing store directory {directory}: it must be owned by this user and not writable by others.")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        if os.fstat(fd).st_uid != os.getuid():
+            raise RuntimeError(f"Refusing store {path}: it is owned by another user.")
+        os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+    return path
+
+
+class SQLiteBackend:
+    """Store shared by every worker on the host through a SQLite file in WAL mode.
+
+    Entries beyond max_bytes are evicted least recently accessed first.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.local = threading.local()
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entries ('
+                ' key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value BLOB NOT NULL,'
+                ' size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_namespace ON cache_entries (namespace)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_accessed_at ON cache_entries (accessed_at)')
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute('SELECT value, expires_at, accessed_at FROM cache_entries WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None:
+            return None
+        value, expires_at, accessed_at = row
+        if expires_at < now:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+            return None
+        # Touching at most once a second keeps hot keys from turning every hit into a write
+        if accessed_at < now - 1:
+            conn.execute('UPDATE cache_entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return value
+
+    def set(self, namespace, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        conn = self._conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, namespace, value, size, expires_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, namespace, value, len(value), now + ttl, now)
+            )
+            excess = conn.execute('SELECT COALESCE(SUM(size), 0) FROM cache_entries').fetchone()[0] - self.max_bytes
+            if excess > 0:
+                # Expired entries go first, then the least recently accessed
+                victims = []
+                for victim, size in conn.execute(
+                    'SELECT key, size FROM cache_entries WHERE key != ? ORDER BY expires_at < ? DESC, accessed_at',
+                    (key, now)
+                ):
+                    victims.append((victim,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany('DELETE FROM cache_entries WHERE key = ?', victims)
+                CACHE_EVICTIONS.inc(len(victims))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete_namespace(self, namespace):
+        self._conn().execute('DELETE FROM cache_entries WHERE namespace = ?', (namespace,))
+
+
+class Cache:
+    """Namespaced cache over a pluggable backend, with TTL and hit/miss metrics."""
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 300
+
+    def init_app(self, app):
+        backend = app.config['CACHE_BACKEND']
+        max_bytes = app.config['CACHE_MAX_BYTES']
+        if backend == 'sqlite':
+            self.backend = SQLiteBackend(app.config['CACHE_PATH'], max_bytes)
+        elif backend == 'shm':
+            # Same store on a RAM-backed filesystem, so nothing touches disk
+            self.backend = SQLiteBackend(app.config['CACHE_SHM_PATH'], max_bytes)
+        else:
+            self.backend = LRUBackend(max_bytes)
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+
+    def _key(self, namespace, key):
+        dependencies = NAMESPACE_DEPENDENCIES.get(namespace, ())
+        versions = _current_versions() if dependencies else {}
+        version_part = ','.join(f'{name}={versions.get(name, 0)}' for name in dependencies)
+        return f'{namespace}|{version_part}|{key}'
+
+    def get(self, namespace, key, default=None):
+        value = self.backend.get(self._key(namespace, key))
+        CACHE_REQUESTS.labels(namespace=namespace, result='miss' if value is None else 'hit').inc()
+        return pickle.loads(value) if value is not None else default
+
+    def set(self, namespace, key, value, ttl=None):
+        self.backend.set(namespace, self._key(namespace, key),
+                         pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl or self.default_ttl)
+
+    def get_or_set(self, namespace, key, func, ttl=None):
+        """Return the cached value for key, computing and storing it with func() on a miss."""
+        value = self.get(namespace, key, _MISSING)
+        if value is _MISSING:
+            value = func()
+            self.set(namespace, key, value, ttl)
+        return value
+
+    def invalidate(self, namespace):
+        """Drop every entry in a namespace."""
+        self.backend.delete_namespace(namespace)
+
+
+cache = Cache()
+
+
+def init_cache(app):
+    """Configure the shared cache backend and keep its version keys fresh after commits."""
+    app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+    app.config.setdefault('CACHE_PATH', os.environ.get('CACHE_PATH', os.path.join(app.instance_path, 'cache.sqlite')))
+    # A per-user directory, since /dev/shm itself is writable by everyone
+    app.config.setdefault('CACHE_SHM_PATH', os.environ.get(
+        'CACHE_SHM_PATH', f'/dev/shm/da11-{os.getuid()}/cache.sqlite'))
+    app.config.setdefault('CACHE_DEFAULT_TTL', int(os.environ.get('CACHE_DEFAULT_TTL', 300)))
+    app.config.setdefault('CACHE_MAX_BYTES', int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+    if app.config['CACHE_BACKEND'] == 'sqlite':
+        private_store(app.config['CACHE_PATH'])
+    elif app.config['CACHE_BACKEND'] == 'shm':
+        private_store(app.config['CACHE_SHM_PATH'])
+    cache.init_app(app)
+
+    if not event.contains(Session, 'after_commit', _forget_versions):
+        event.listen(Session, 'after_commit', _forget_versions)
+
+
+def _current_versions():
+    """All data versions, read once per request (or app context) with a single query."""
+    versions = g.get('_cache_versions') if has_app_context() else None
+    if versions is None:
+        versions = dict(db.session.execute(select(DataVersion.name, DataVersion.version)).all())
+        if has_app_context():
+            g._cache_versions = versions
+    return versions
+
+
+def _forget_versions(session):
+    # A commit may have bumped a version, so re-read them on the next cache lookup
+    if has_app_context():
+        g.pop('_cache_versions', None)
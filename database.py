@@ -1,29 +1,81 @@
 import os
+import time
+from functools import wraps
+from flask import g, session, current_app, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from datetime import datetime
 
-db = SQLAlchemy()
+# Bind key of the optional read replica (DATABASE_REPLICA_URL)
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Session that sends reads in @use_replica requests to the replica bind.
+
+    Flushes, INSERT/UPDATE/DELETE statements and bare connection() calls go to the
+    primary, and so does everything after them in the same session.
+    """
+
+    def connection(self, bind_arguments=None, **kwargs):
+        # Callers take the connection itself to write through it (e.g. the version bumps)
+        if not bind_arguments:
+            self.info['wrote'] = True
+        return super().connection(bind_arguments=bind_arguments, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and REPLICA_BIND in self._db.engines:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote') and _replica_allowed():
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def _normalize_url(url):
+    # Render uses postgres:// but SQLAlchemy requires postgresql://
+    if url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
 
 def init_db(app):
     """Initialize the database with the Flask app."""
     # Use DATABASE_URL from environment (Render provides this for PostgreSQL)
     # Fall back to SQLite for local development
-    database_url = os.environ.get('DATABASE_URL', 'sqlite:///da11_tracker.db')
-
-    # Render uses postgres:// but SQLAlchemy requires postgresql://
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    database_url = _normalize_url(os.environ.get('DATABASE_URL', 'sqlite:///da11_tracker.db'))
 
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Optional read replica for @use_replica routes. Tables are never created on it.
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA_BIND] = _normalize_url(replica_url)
+    app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS',
+                          float(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS', 10)))
     db.init_app(app)
 
+    if not event.contains(RoutingSession, 'after_commit', _stick_to_primary):
+        event.listen(RoutingSession, 'after_commit', _stick_to_primary)
+
     with app.app_context():
         db.create_all()
 
         # Create or update default admin user
         from models import User
-        admin = User.query.filter_by(username='admin').first()
+        try:
+            admin = User.query.filter_by(username='admin').first()
+        except (OperationalError, ProgrammingError) as e:
+            # An older schema; let `flask --app app migrate` bring it up to date first
+            db.session.rollback()
+            print(f"Admin user not checked, database needs migrating: {e.orig}")
+            return
         if admin is None:
             admin = User(
                 username='admin',
@@ -49,3 +101,31 @@ def init_db(app):
             admin.set_password('DA11Admin2024!')
             db.session.commit()
             print("Admin user updated")
+
+
+def use_replica(f):
+    """Decorator to send the reads of a read-only view to the replica, when one is configured.
+
+    Put it directly under @app.route so the user lookup is routed too.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g._use_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def pin_to_primary():
+    """Send the rest of this session's reads to the primary, for reads whose results will be written back."""
+    db.session.info['wrote'] = True
+
+
+def _replica_allowed():
+    # Browsers that wrote recently read from the primary until the replica has caught up
+    return (has_request_context() and g.get('_use_replica', False)
+            and session.get('_primary_until', 0) < time.time())
+
+
+def _stick_to_primary(db_session):
+    if db_session.info.get('wrote') and has_request_context():
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
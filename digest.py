@@ -0,0 +1,99 @@
+import os
+from datetime import date, datetime
+import click
+from flask import render_template, url_for
+from flask_mail import Message
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import User, DigestLog
+from queries import at_risk_records, stalled_records
+from metrics import track_email
+
+
+def init_digest(app, mail):
+    """Register the send-digest CLI command."""
+    app.config.setdefault('DIGEST_WINDOW_DAYS', int(os.environ.get('DIGEST_WINDOW_DAYS', 14)))
+    app.config.setdefault('DIGEST_STALLED_DAYS', int(os.environ.get('DIGEST_STALLED_DAYS', 30)))
+    # Links in the email point here, since cron runs have no incoming request
+    app.config.setdefault('DIGEST_BASE_URL', os.environ.get('DIGEST_BASE_URL', 'http://localhost:5000'))
+
+    @app.cli.command('send-digest')
+    @click.option('--window-days', type=int, default=None,
+                  help='Report ungraded records whose EPA window closes within this many days.')
+    @click.option('--stalled-days', type=int, default=None,
+                  help='Report open records whose status has not changed for this many days.')
+    @click.option('--dry-run', is_flag=True, help='Print the digest summary without sending email.')
+    def send_digest_command(window_days, stalled_days, dry_run):
+        """Email the daily at-risk and stalled records digest to every admin."""
+        window_days = window_days if window_days is not None else app.config['DIGEST_WINDOW_DAYS']
+        stalled_days = stalled_days if stalled_days is not None else app.config['DIGEST_STALLED_DAYS']
+        with app.test_request_context(base_url=app.config['DIGEST_BASE_URL']):
+            sent, skipped = send_daily_digest(mail, window_days, stalled_days, dry_run=dry_run)
+        print(f"Digest complete: {sent} sent, {skipped} already sent today.")
+
+
+def send_daily_digest(mail, window_days, stalled_days, dry_run=False):
+    """Send one digest email per active admin over a single SMTP connection.
+
+    Each admin is logged for today before their email goes out, so reruns and
+    concurrent runs never send twice; a failed send removes the log row again.
+    Returns (sent, skipped).
+    """
+    today = date.today()
+    at_risk = at_risk_records(window_days).all()
+    stalled = stalled_records(stalled_days).all()
+
+    admins = User.query.filter(
+        User.role == 'admin',
+        User.is_active.is_(True),
+        User.deleted_account_date.is_(None)
+    ).order_by(User.id).all()
+    already_sent = {
+        user_id for (user_id,) in
+        db.session.query(DigestLog.user_id).filter(DigestLog.digest_date == today).all()
+    }
+    pending = [admin for admin in admins if admin.id not in already_sent]
+
+    print(f"{len(at_risk)} record(s) closing within {window_days} days, "
+          f"{len(stalled)} stalled for over {stalled_days} days.")
+    if dry_run or not pending:
+        return 0, len(admins) - len(pending)
+
+    context = {
+        'digest_date': today,
+        'at_risk': at_risk,
+        'stalled': stalled,
+        'window_days': window_days,
+        'stalled_days': stalled_days,
+        'worklist_url': url_for('worklist', days=window_days, _external=True),
+    }
+
+    sent, claimed_elsewhere = 0, 0
+    with mail.connect() as conn:
+        for admin in pending:
+            # Claim the admin for today before sending, so a concurrent run cannot send it too
+            claim = DigestLog(digest_date=today, user_id=admin.id, sent_at=datetime.now())
+            db.session.add(claim)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                claimed_elsewhere += 1
+                continue
+
+            msg = Message(f"DA1.1 Tracker Daily Digest - {today.strftime('%d/%m/%Y')}",
+                          recipients=[admin.email])
+            msg.html = render_template('emails/digest.html', forename=admin.forename, **context)
+            msg.body = render_template('emails/digest.txt', forename=admin.forename, **context)
+            try:
+                with track_email():
+                    conn.send(msg)
+            except Exception as e:
+                print(f"Email error for {admin.email}: {e}")
+                # Release the claim so the next run tries this admin again
+                db.session.delete(claim)
+                db.session.commit()
+                continue
+            sent += 1
+
+    return sent, len(admins) - len(pending) + claimed_elsewhere
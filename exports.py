@@ -0,0 +1,264 @@
+import io
+import os
+import csv
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from itertools import islice
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+from database import db
+from queries import combined_records, EPA_WINDOW_DAYS
+from offload import submit_render, render_here, processes_broken
+
+# Column headers shared by every export format
+EXPORT_HEADERS = ['ACE360 ID', 'Status', 'Gateway Submitted', 'EPA Ready Date', 'EPA Window Closure',
+                  'Project Start Date', 'Project Deadline', 'First Attempt', 'Second Attempt',
+                  'Variance (Days)', 'Overall Grade', 'Grade Date', 'EPA Completed within SLA']
+
+# ZIP export partitions: query parameter value -> label for records with no value
+PARTITION_KEYS = {
+    'status': 'No Status',
+    'month': 'No EPA Ready Date',
+}
+
+# Rows fetched from the cursor per Parquet row group / Arrow record batch
+EXPORT_CHUNK_SIZE = 10000
+
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+ARROW_SCHEMA = pa.schema(list(zip(EXPORT_HEADERS, [
+    pa.int64(), _CATEGORY, pa.date32(), pa.date32(), pa.date32(),
+    pa.date32(), pa.date32(), pa.date32(), pa.date32(),
+    pa.int32(), _CATEGORY, pa.date32(), _CATEGORY,
+])))
+
+EXPORT_FIELDS = ['ace360_id', 'status', 'gateway_submitted', 'approved_for_epa', 'project_start_date',
+                 'project_deadline_date', 'first_attempt_date', 'second_attempt_date',
+                 'overall_grade', 'grade_date']
+
+
+def init_exports(app):
+    """Configure how many partitions of one ZIP export may wait on the render pool at once."""
+    app.config.setdefault('EXPORT_ZIP_WORKERS',
+                          int(os.environ.get('EXPORT_ZIP_WORKERS', min(4, os.cpu_count() or 1))))
+
+
+def export_row(r):
+    """Format one record as a row in the EXPORT_HEADERS layout."""
+    return [
+        r.ace360_id,
+        r.status if r.status else '',
+        str(r.gateway_submitted) if r.gateway_submitted else '',
+        str(r.approved_for_epa) if r.approved_for_epa else '',
+        r.epa_window_closure if r.epa_window_closure else '',
+        str(r.project_start_date) if r.project_start_date else '',
+        str(r.project_deadline_date) if r.project_deadline_date else '',
+        str(r.first_attempt_date) if r.first_attempt_date else '',
+        str(r.second_attempt_date) if r.second_attempt_date else '',
+        r.variance_days if r.variance_days is not None else '',
+        r.overall_grade if r.overall_grade else '',
+        str(r.grade_date) if r.grade_date else '',
+        r.within_epa_window if r.within_epa_window else ''
+    ]
+
+
+def partition_key(r, partition_by):
+    """Name of the ZIP export partition a record belongs to."""
+    if partition_by == 'month':
+        value = r.approved_for_epa.strftime('%Y-%m') if r.approved_for_epa else None
+    else:
+        value = r.status
+    return value or PARTITION_KEYS[partition_by]
+
+
+def build_csv(headers, rows):
+    """Build a CSV export as text."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def build_xlsx(headers, rows):
+    """Build an Excel export as bytes."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Apprentice Records'
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def build_pdf(headers, rows):
+    """Build a PDF export as bytes."""
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=landscape(letter))
+    styles = getSampleStyleSheet()
+    elements = []
+    elements.append(Paragraph('Apprentice Records: Data Analyst', styles['Title']))
+    table_data = [headers] + rows
+    table = Table(table_data)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#512eab')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 9),
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]))
+    elements.append(table)
+    doc.build(elements)
+    return output.getvalue()
+
+
+# Builders are module-level functions so the ZIP export's process pool can pickle them
+FILE_BUILDERS = {
+    'csv': build_csv,
+    'xlsx': build_xlsx,
+    'pdf': build_pdf,
+}
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file that collects bytes for a streaming response to drain."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield raw record tuples (EXPORT_FIELDS order), chunk_size at a time, from a streamed cursor."""
+    model = combined_records()
+    result = db.session.execute(
+        select(*[getattr(model, field) for field in EXPORT_FIELDS])
+        .order_by(model.id.desc())
+        .execution_options(yield_per=chunk_size)
+    )
+    yield from result.partitions()
+
+
+def record_batch(rows):
+    """Build a typed Arrow record batch in the EXPORT_HEADERS layout from raw record tuples."""
+    (ace360_ids, statuses, gateway, approved, project_start, deadline,
+     first_attempt, second_attempt, grades, grade_dates) = zip(*rows)
+    window_closure = [a + timedelta(days=EPA_WINDOW_DAYS) if a else None for a in approved]
+    variance = [(f - d).days if f and d else None for f, d in zip(first_attempt, deadline)]
+    within_sla = [
+        ('Yes' if (g - a).days <= EPA_WINDOW_DAYS else 'No') if g and a else None
+        for g, a in zip(grade_dates, approved)
+    ]
+
+    columns = [ace360_ids, [s or None for s in statuses], gateway, approved, window_closure,
+               project_start, deadline, first_attempt, second_attempt, variance,
+               [g or None for g in grades], grade_dates, within_sla]
+    arrays = [
+        pa.array(values, type=pa.string()).dictionary_encode() if field.type == _CATEGORY
+        else pa.array(values, type=field.type)
+        for field, values in zip(ARROW_SCHEMA, columns)
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+
+def stream_parquet(add_rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a Parquet file of all records, one row group per cursor chunk."""
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, ARROW_SCHEMA) as writer:
+        for rows in export_chunks(chunk_size):
+            writer.write_batch(record_batch(rows), row_group_size=chunk_size)
+            add_rows(len(rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_arrow(add_rows, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an Arrow IPC stream of all records, one record batch per cursor chunk."""
+    sink = _StreamSink()
+    with pa.ipc.new_stream(sink, ARROW_SCHEMA) as writer:
+        for rows in export_chunks(chunk_size):
+            writer.write_batch(record_batch(rows))
+            add_rows(len(rows))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_partitioned_zip(headers, partitions, fmt, max_in_flight):
+    """Build one file per partition in the render pool and yield a ZIP archive as each finishes.
+
+    The pool is shared with the worker's other exports, so no more than
+    max_in_flight partitions are queued at a time and other requests' files
+    are not stuck behind a large archive. The sink is not seekable, so zipfile
+    writes data descriptors and each entry can be sent as soon as it is added.
+    """
+    builder = FILE_BUILDERS[fmt]
+    sink = _StreamSink()
+    remaining = iter(partitions.items())
+    futures = {}
+    entry_names = set()
+
+    def entry_name(name):
+        # Different partitions can sanitise to the same name, or to nothing at all
+        stem = secure_filename(name) or f'partition-{len(entry_names) + 1}'
+        candidate, counter = stem, 1
+        while f'{candidate}.{fmt}' in entry_names:
+            counter += 1
+            candidate = f'{stem}_{counter}'
+        entry_names.add(f'{candidate}.{fmt}')
+        return f'{candidate}.{fmt}'
+
+    def submit(count):
+        for name, rows in islice(remaining, count):
+            # Named in partition order, so a clash gets the same suffix whichever file finishes first
+            futures[submit_render(builder, headers, rows)] = (name, entry_name(name))
+
+    try:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            submit(max(1, max_in_flight))
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, entry = futures.pop(future)
+                    try:
+                        content = future.result()
+                    except BrokenProcessPool as error:
+                        processes_broken(error)
+                        content = render_here(builder, headers, partitions[name]).result()
+                    archive.writestr(entry, content)
+                    yield sink.drain()
+                submit(len(done))
+        yield sink.drain()
+    finally:
+        # The client went away or a build failed: drop partitions that have not started
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,49 @@
+import os
+import hashlib
+from flask import current_app
+from flask_login import current_user
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from cache import cache
+from models import ApprenticeRecord
+
+ROW_TEMPLATE = 'record_row.html'
+ROW_FIELDS = [column.name for column in ApprenticeRecord.__table__.columns]
+
+
+def init_fragments(app):
+    """Persist compiled templates across workers and register the cached record_row helper."""
+    app.config.setdefault('JINJA_BYTECODE_CACHE_DIR', os.environ.get(
+        'JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache')))
+    app.config.setdefault('RECORD_ROW_CACHE_TTL', int(os.environ.get('RECORD_ROW_CACHE_TTL', 3600)))
+
+    # Entries are keyed by template name and source checksum, so an edited template recompiles
+    cache_dir = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    app.jinja_env.globals['record_row'] = record_row
+
+
+def row_version(record):
+    """Digest of a record's stored values, which changes whenever the record is written."""
+    values = '|'.join(str(getattr(record, field)) for field in ROW_FIELDS)
+    return hashlib.blake2b(values.encode(), digest_size=8).hexdigest()
+
+
+def record_row(record, archived=False):
+    """Rendered /records table rows for one record, from the shared cache when possible.
+
+    The key holds the record id, its row version, the viewer's role and the deployed
+    code, so an edit, a role change or a deploy renders the row afresh.
+    """
+    is_admin = current_user.is_admin()
+    key = ':'.join([str(record.id), row_version(record), current_user.role, 'archived' if archived else 'live',
+                    current_app.config['ETAG_DEPLOY_STAMP']])
+    html = cache.get('record_rows', key)
+    if html is None:
+        template = current_app.jinja_env.get_template(ROW_TEMPLATE)
+        html = template.render(record=record, archived=archived, is_admin=is_admin)
+        cache.set('record_rows', key, html, current_app.config['RECORD_ROW_CACHE_TTL'])
+    return Markup(html)
@@ -0,0 +1,34 @@
+import os
+import stat
+import shutil
+import tempfile
+
+# Prometheus multiprocess mode: each worker writes its metric values to files in
+# this directory and /metrics merges them, so counts aggregate across workers.
+# Unless one is configured, every run gets a fresh directory only this user can open.
+created_prometheus_dir = 'PROMETHEUS_MULTIPROC_DIR' not in os.environ
+if created_prometheus_dir:
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='da11-prometheus-')
+prometheus_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+
+def on_starting(server):
+    """Check the metrics directory belongs to this user alone and clear files left by a previous run."""
+    os.makedirs(prometheus_dir, mode=0o700, exist_ok=True)
+    info = os.lstat(prometheus_dir)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise RuntimeError(f"{prometheus_dir} must be a directory owned by this user and writable only by it.")
+    for name in os.listdir(prometheus_dir):
+        os.remove(os.path.join(prometheus_dir, name))
+
+
+def on_exit(server):
+    """Remove the metrics directory if this run created it."""
+    if created_prometheus_dir:
+        shutil.rmtree(prometheus_dir, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    """Drop live gauges belonging to a worker that has exited."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
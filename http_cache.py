@@ -0,0 +1,108 @@
+import os
+import gzip
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from flask import request, session, current_app, make_response
+from flask_login import current_user
+from sqlalchemy import select
+from database import db
+from models import DataVersion
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml',
+}
+
+
+def init_http_cache(app):
+    """Compress text responses and stamp deploys into conditional-request ETags."""
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('COMPRESS_MIN_SIZE', 1024)))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.environ.get('COMPRESS_LEVEL', 6)))
+
+    # Templates and code are part of every page, so a deploy must change the ETags
+    stamp = hashlib.sha1()
+    for folder in (app.root_path, os.path.join(app.root_path, app.template_folder)):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(('.py', '.html')):
+                stamp.update(f'{name}:{os.path.getmtime(os.path.join(folder, name))}'.encode())
+    app.config['ETAG_DEPLOY_STAMP'] = stamp.hexdigest()
+
+    app.after_request(compress_response)
+
+
+def conditional(*names):
+    """Answer repeat GETs with 304, without calling the view, while the page's inputs are unchanged.
+
+    The ETag covers the given data version namespaces, the viewer, the URL and today's
+    date. Last-Modified is the latest of those versions' update times.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Pending flash messages are part of the page but not of the ETag
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            rows = db.session.execute(
+                select(DataVersion.name, DataVersion.version, DataVersion.updated_at)
+                .where(DataVersion.name.in_(names))
+                .order_by(DataVersion.name)
+            ).all()
+            today = date.today()
+            etag = hashlib.sha1('|'.join([
+                current_app.config['ETAG_DEPLOY_STAMP'],
+                str(current_user.get_id()), str(getattr(current_user, 'role', None)),
+                request.full_path, today.isoformat(),
+                *[f'{name}={version}' for name, version, _ in rows],
+            ]).encode()).hexdigest()
+            last_modified = max(
+                [datetime.combine(today, time.min)] + [updated_at for _, _, updated_at in rows if updated_at]
+            ).astimezone(timezone.utc).replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                response.last_modified = last_modified
+                # Pages are per user, and the browser must check back before reusing one
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+
+def compress_response(response):
+    """Brotli or gzip encode text responses above COMPRESS_MIN_SIZE, as the client accepts."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    level = current_app.config['COMPRESS_LEVEL']
+    if brotli is not None and request.accept_encodings['br']:
+        response.set_data(brotli.compress(data, quality=min(level, 11)))
+        response.headers['Content-Encoding'] = 'br'
+    elif request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=level, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import signal
+import tempfile
+import threading
+import subprocess
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+import click
+import numpy as np
+from sqlalchemy import create_engine, insert
+from database import db
+from models import User, ApprenticeRecord, DataVersion, STATUS_OPTIONS, CLOSED_STATUSES
+from passwords import hash_password
+from queries import EPA_WINDOW_DAYS
+
+LOADTEST_PASSWORD = 'LoadTest1!'
+DEFAULT_MIX = 'dashboard=40,records=30,view=20,export=5,login=5'
+EXPORT_FORMATS = ['csv', 'xlsx', 'pdf', 'zip', 'parquet', 'arrow']
+PERCENTILES = [50, 95, 99]
+SCENARIOS = ['dashboard', 'records', 'view', 'export', 'login', 'login-flood']
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses, so a login is timed without the dashboard it redirects to."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+
+def parse_mix(value):
+    """Parse 'dashboard=40,records=30,...' into {scenario: weight}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise click.BadParameter(f"Unknown scenario '{name.strip()}'. Choose from {', '.join(SCENARIOS)}.")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def seed_database(url, records, users, seed=0):
+    """Create a database with records spread across the pipeline and active viewers who can log in.
+
+    The admin user and data version rows are created here too, so gunicorn
+    workers starting together never race to create them.
+    """
+    rng = random.Random(seed)
+    engine = create_engine(url)
+    db.metadata.create_all(engine)
+    password_hash = hash_password(LOADTEST_PASSWORD)
+    now = datetime.now()
+    today = date.today()
+
+    accounts = [dict(username='admin', email='admin@loadtest.local', role='admin')]
+    accounts += [dict(username=f'loadtest{i}', email=f'loadtest{i}@loadtest.local', role='viewer') for i in range(users)]
+    for account in accounts:
+        account.update(password_hash=password_hash, forename='Load', surname='Test', job_title='Coordinator',
+                       user_created_date=now, is_active=True, approval_status='approved')
+
+    rows = []
+    for i in range(records):
+        status = rng.choice(STATUS_OPTIONS)
+        stage = STATUS_OPTIONS.index(status)
+        gateway = today - timedelta(days=rng.randint(0, 730))
+        approved = gateway + timedelta(days=rng.randint(5, 40)) if stage >= STATUS_OPTIONS.index('Approved for EPA') else None
+        first_attempt = approved + timedelta(days=rng.randint(10, 60)) if approved and rng.random() < 0.7 else None
+        grade_date = approved + timedelta(days=rng.randint(20, 84)) if approved and status in CLOSED_STATUSES else None
+        grade = None
+        if status == 'EPA Passed':
+            grade = rng.choice(['Distinction', 'Merit', 'Pass'])
+        elif status == 'EPA Failed':
+            grade = 'Fail'
+        rows.append(dict(
+            ace360_id=100000 + i, status=status, gateway_submitted=gateway, approved_for_epa=approved,
+            project_start_date=approved, project_deadline_date=approved + timedelta(days=70) if approved else None,
+            first_attempt_date=first_attempt, overall_grade=grade, grade_date=grade_date,
+            epa_window_closes=approved + timedelta(days=EPA_WINDOW_DAYS) if approved else None,
+            status_updated_date=today - timedelta(days=rng.randint(0, 90)),
+        ))
+
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), accounts)
+        if rows:
+            conn.execute(insert(ApprenticeRecord.__table__), rows)
+        conn.execute(insert(DataVersion.__table__),
+                     [dict(name=name, version=0, updated_at=now) for name in ('records', 'users')])
+    engine.dispose()
+
+
+def _scenario_request(name, rng, records, export_format):
+    if name == 'dashboard':
+        return '/'
+    if name == 'records':
+        return '/records?' + urllib.parse.urlencode({'status': rng.choice(STATUS_OPTIONS), 'page': rng.randint(1, 3)})
+    if name == 'view':
+        return f'/view/{rng.randint(1, max(records, 1))}'
+    if name == 'export':
+        return f'/export/{export_format}'
+    raise ValueError(name)
+
+
+def _client(base_url, username, mix, records, export_format, deadline, measure_from, samples, seed):
+    """One simulated user: log in, then issue weighted requests until the deadline."""
+    rng = random.Random(seed)
+    credentials = urllib.parse.urlencode({'username': username, 'password': LOADTEST_PASSWORD}).encode()
+    wrong_credentials = urllib.parse.urlencode({'username': 'admin', 'password': 'WrongPassword1!'}).encode()
+    session = _opener()
+    _fetch(session, base_url + '/login', credentials)
+    names, weights = list(mix), list(mix.values())
+
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.time()
+        if name == 'login':
+            status = _fetch(_opener(), base_url + '/login', credentials)
+        elif name == 'login-flood':
+            # Password guessing against the admin account from a new session each time
+            status = _fetch(_opener(), base_url + '/login', wrong_credentials)
+        else:
+            status = _fetch(session, base_url + _scenario_request(name, rng, records, export_format))
+        if started >= measure_from:
+            # A successful login redirects, a guess is refused (200) or rate limited (429),
+            # and anything else should be a 2xx
+            if name == 'login':
+                ok = status == 302
+            elif name == 'login-flood':
+                ok = status in (200, 429)
+            else:
+                ok = 200 <= status < 300
+            samples.append((name, (time.time() - started) * 1000, ok))
+
+
+def _fetch(opener, url, data=None):
+    """Request url and read the whole body. Returns the status code, or 0 on a connection error."""
+    try:
+        with opener.open(url, data, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+    except OSError:
+        return 0
+
+
+def summarise(samples, seconds):
+    """Per-scenario and overall request counts, errors, throughput and latency percentiles."""
+    results = {}
+    groups = {}
+    for name, latency, ok in samples:
+        groups.setdefault(name, []).append((latency, ok))
+    groups = dict(sorted(groups.items()))
+    groups['all'] = [(latency, ok) for name, latency, ok in samples]
+
+    for name, entries in groups.items():
+        latencies = np.array([latency for latency, _ in entries])
+        errors = sum(1 for _, ok in entries if not ok)
+        results[name] = {
+            'requests': len(entries),
+            'errors': errors,
+            'rps': round(len(entries) / seconds, 2),
+            **{f'p{p}_ms': round(float(np.percentile(latencies, p)), 1) if len(latencies) else None
+               for p in PERCENTILES},
+        }
+    return results
+
+
+def print_results(results, baseline=None):
+    """Print a results table, with the change against a previous run's results when given."""
+    header = f"{'Endpoint':<12}{'Requests':>10}{'Errors':>8}{'Req/s':>9}" + ''.join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+    print(header)
+    for name, entry in results.items():
+        print(f"{name:<12}{entry['requests']:>10}{entry['errors']:>8}{entry['rps']:>9.1f}"
+              + ''.join(f"{entry[f'p{p}_ms'] if entry[f'p{p}_ms'] is not None else '-':>10}" for p in PERCENTILES))
+        previous = (baseline or {}).get(name)
+        if previous:
+            changes = [_change(entry['rps'], previous['rps'])]
+            changes += [_change(entry[f'p{p}_ms'], previous[f'p{p}_ms']) for p in PERCENTILES]
+            print(f"{'  vs base':<12}{'':>10}{'':>8}{changes[0]:>9}" + ''.join(f'{c:>10}' for c in changes[1:]))
+
+
+def _change(value, previous):
+    if value is None or not previous:
+        return '-'
+    return f'{(value - previous) / previous * 100:+.0f}%'
+
+
+def _git_commit(path):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _wait_until_up(base_url, server, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise click.ClickException('gunicorn exited during startup.')
+        if _fetch(_opener(), base_url + '/login') == 200:
+            return
+        time.sleep(0.25)
+    raise click.ClickException(f'gunicorn did not answer within {timeout} seconds.')
+
+
+def init_loadtest(app):
+    """Register the load-test CLI command."""
+    app.config.setdefault('LOADTEST_RESULTS_DIR', os.environ.get(
+        'LOADTEST_RESULTS_DIR', os.path.join(app.instance_path, 'loadtest')))
+
+    @app.cli.command('load-test')
+    @click.option('--clients', type=int, default=50, help='Concurrent simulated users.')
+    @click.option('--duration', type=float, default=30, help='Seconds of measured traffic.')
+    @click.option('--warmup', type=float, default=5, help='Seconds of unmeasured traffic first.')
+    @click.option('--mix', default=DEFAULT_MIX, show_default=True,
+                  help=f"Scenario weights, from: {', '.join(SCENARIOS)}.")
+    @click.option('--export-format', type=click.Choice(EXPORT_FORMATS), default='csv', help='Export the export scenario fetches.')
+    @click.option('--records', type=int, default=5000, help='Apprentice records in the seeded database.')
+    @click.option('--workers', type=int, default=2, help='gunicorn worker processes.')
+    @click.option('--threads', type=int, default=4, help='Threads per gunicorn worker.')
+    @click.option('--port', type=int, default=8050, help='Port gunicorn listens on (localhost only).')
+    @click.option('--rate-limit', is_flag=True,
+                  help='Keep login rate limiting on. All clients share one IP, so unless RATELIMIT_IP is set '
+                       'the per-IP limit is raised just enough for each client to log in once.')
+    @click.option('--output', type=click.Path(dir_okay=False), default=None,
+                  help='Where to save the JSON results (default: a timestamped file in LOADTEST_RESULTS_DIR).')
+    @click.option('--compare', type=click.Path(exists=True, dir_okay=False), default=None,
+                  help='Previous results file to report changes against.')
+    def load_test_command(clients, duration, warmup, mix, export_format, records, workers, threads, port,
+                          rate_limit, output, compare):
+        """Run gunicorn on a seeded database and measure latency under concurrent mixed traffic.
+
+        Server settings such as CACHE_BACKEND or RECORD_SNAPSHOT_ENABLED are taken
+        from the environment, so runs with different settings can be compared.
+        The login-flood scenario guesses the admin password; run it with --rate-limit
+        to see how the limiter keeps the other pages responsive.
+        """
+        weights = parse_mix(mix)
+        workdir = tempfile.mkdtemp(prefix='da11-loadtest-')
+        database_url = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+        print(f"Seeding {records} record(s) and {clients} user(s)...")
+        seed_database(database_url, records, clients)
+
+        env = dict(os.environ, DATABASE_URL=database_url, RATELIMIT_ENABLED='1' if rate_limit else '0',
+                   RATELIMIT_PATH=os.path.join(workdir, 'ratelimit.sqlite'),
+                   CACHE_PATH=os.path.join(workdir, 'cache.sqlite'),
+                   PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'prometheus'))
+        env.pop('DATABASE_REPLICA_URL', None)
+        if rate_limit:
+            env.setdefault('RATELIMIT_IP', f'{clients + 20}/60')
+        base_url = f'http://127.0.0.1:{port}'
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-w', str(workers), '--threads', str(threads),
+             '-b', f'127.0.0.1:{port}', 'app:app'],
+            cwd=app.root_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_up(base_url, server)
+            print(f"Running {clients} client(s) for {warmup:g}s warm-up + {duration:g}s against "
+                  f"{workers} worker(s) x {threads} thread(s)...")
+            samples = []
+            measure_from = time.time() + warmup
+            deadline = measure_from + duration
+            client_threads = [
+                threading.Thread(target=_client, daemon=True, args=(
+                    base_url, f'loadtest{i}', weights, records, export_format, deadline, measure_from, samples, i))
+                for i in range(clients)
+            ]
+            for thread in client_threads:
+                thread.start()
+            for thread in client_threads:
+                thread.join()
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        results = summarise(samples, duration)
+        baseline = None
+        if compare:
+            with open(compare) as f:
+                baseline = json.load(f)['results']
+        print_results(results, baseline)
+
+        started = datetime.fromtimestamp(measure_from)
+        if output is None:
+            os.makedirs(app.config['LOADTEST_RESULTS_DIR'], exist_ok=True)
+            output = os.path.join(app.config['LOADTEST_RESULTS_DIR'], f'{started:%Y%m%d-%H%M%S}.json')
+        settings = {name: os.environ[name] for name in sorted(os.environ)
+                    if name.startswith(('CACHE_', 'RECORD_', 'PASSWORD_', 'REPLICA_', 'RATELIMIT_'))}
+        with open(output, 'w') as f:
+            json.dump({
+                'started_at': started.isoformat(timespec='seconds'),
+                'commit': _git_commit(app.root_path),
+                'config': {'clients': clients, 'duration': duration, 'warmup': warmup, 'mix': weights,
+                           'export_format': export_format, 'records': records, 'workers': workers,
+                           'threads': threads, 'rate_limit': rate_limit, 'env': settings},
+                'results': results,
+            }, f, indent=2)
+        print(f"Results saved to {output}")
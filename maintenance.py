@@ -0,0 +1,228 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import delete, insert, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import User, DigestLog, MaintenanceLock
+from analytics import cached_dashboard, monthly_trends, pipeline_analytics
+from queries import record_source, filter_records
+
+TASKS = ['purge', 'analyze', 'warm']
+LOCK_NAME = 'maintenance'
+
+# Tables whose planner statistics matter, vacuumed individually on PostgreSQL
+ANALYZE_TABLES = ['users', 'apprentice_records', 'apprentice_records_archive']
+
+# Dashboard warm-ups requested by data loads run one at a time, off the request thread
+_warm_queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix='dashboard-warm')
+_timer = {'pid': None}
+
+
+def init_maintenance(app):
+    """Register the maintenance CLI command and, if configured, the in-process maintenance timer."""
+    app.config.setdefault('MAINTENANCE_INTERVAL_SECONDS', int(os.environ.get('MAINTENANCE_INTERVAL_SECONDS', 0)))
+    app.config.setdefault('MAINTENANCE_LOCK_SECONDS', int(os.environ.get('MAINTENANCE_LOCK_SECONDS', 3600)))
+    app.config.setdefault('MAINTENANCE_BATCH_SIZE', int(os.environ.get('MAINTENANCE_BATCH_SIZE', 1000)))
+    app.config.setdefault('MAINTENANCE_REJECTED_DAYS', int(os.environ.get('MAINTENANCE_REJECTED_DAYS', 30)))
+    app.config.setdefault('MAINTENANCE_PENDING_DAYS', int(os.environ.get('MAINTENANCE_PENDING_DAYS', 90)))
+    app.config.setdefault('MAINTENANCE_DELETED_DAYS', int(os.environ.get('MAINTENANCE_DELETED_DAYS', 30)))
+    app.config.setdefault('MAINTENANCE_VACUUM_FREE_RATIO',
+                          float(os.environ.get('MAINTENANCE_VACUUM_FREE_RATIO', 0.2)))
+
+    @app.cli.command('maintenance')
+    @click.option('--task', 'tasks', type=click.Choice(TASKS), multiple=True,
+                  help='Run only this task (purge, analyze or warm). Repeatable; default is all.')
+    def maintenance_command(tasks):
+        """Purge stale tokens and registrations, refresh planner statistics and warm the dashboard."""
+        if not run_maintenance(app, tasks or TASKS):
+            print("Maintenance is already running elsewhere; nothing done.")
+
+    # Started per worker on its first request, since threads do not survive gunicorn's fork
+    if app.config['MAINTENANCE_INTERVAL_SECONDS'] > 0:
+        @app.before_request
+        def start_maintenance_timer():
+            if _timer['pid'] != os.getpid():
+                _timer['pid'] = os.getpid()
+                threading.Thread(target=_timer_loop, args=(app,), name='maintenance-timer', daemon=True).start()
+
+
+def _timer_loop(app):
+    interval = app.config['MAINTENANCE_INTERVAL_SECONDS']
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                # Every worker wakes up, but only one per interval gets the lock
+                run_maintenance(app, TASKS, min_interval=interval)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Maintenance error: {e}")
+
+
+def acquire_lock(lease_seconds, min_interval=0):
+    """Take the maintenance lease unless another process holds it or it ran within min_interval seconds.
+
+    The conditional UPDATE is atomic on every backend, so across workers and
+    hosts at most one caller gets a row count of 1.
+    """
+    now = datetime.now()
+    try:
+        db.session.execute(insert(MaintenanceLock).values(name=LOCK_NAME))
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+    lock = MaintenanceLock.__table__
+    result = db.session.execute(
+        update(lock)
+        .where(lock.c.name == LOCK_NAME,
+               or_(lock.c.locked_until.is_(None), lock.c.locked_until < now),
+               or_(lock.c.last_run_at.is_(None), lock.c.last_run_at <= now - timedelta(seconds=min_interval)))
+        .values(locked_until=now + timedelta(seconds=lease_seconds), holder=f'{socket.gethostname()}:{os.getpid()}')
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def release_lock():
+    """Give up the maintenance lease and record the run as finished."""
+    lock = MaintenanceLock.__table__
+    db.session.execute(
+        update(lock).where(lock.c.name == LOCK_NAME).values(locked_until=None, holder=None, last_run_at=datetime.now())
+    )
+    db.session.commit()
+
+
+def run_maintenance(app, tasks, min_interval=0):
+    """Run the given tasks under the cross-worker lock. Returns False if the lock was not available."""
+    if not acquire_lock(app.config['MAINTENANCE_LOCK_SECONDS'], min_interval):
+        return False
+    try:
+        if 'purge' in tasks:
+            purge_stale_accounts(
+                app.config['MAINTENANCE_BATCH_SIZE'],
+                rejected_days=app.config['MAINTENANCE_REJECTED_DAYS'],
+                pending_days=app.config['MAINTENANCE_PENDING_DAYS'],
+                deleted_days=app.config['MAINTENANCE_DELETED_DAYS'],
+            )
+        if 'analyze' in tasks:
+            optimize_database(app.config['MAINTENANCE_VACUUM_FREE_RATIO'])
+        if 'warm' in tasks:
+            warm_dashboard()
+    finally:
+        release_lock()
+    return True
+
+
+def _in_batches(query, batch_size, apply):
+    """Run apply(ids) on successive batches of ids from query, committing each one. Returns rows handled."""
+    total = 0
+    while True:
+        ids = db.session.execute(query.order_by(User.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return total
+        apply(ids)
+        db.session.commit()
+        total += len(ids)
+
+
+def _delete_users(ids):
+    db.session.execute(delete(DigestLog).where(DigestLog.user_id.in_(ids)),
+                       execution_options={'synchronize_session': False})
+    db.session.execute(delete(User).where(User.id.in_(ids)), execution_options={'synchronize_session': False})
+
+
+def purge_stale_accounts(batch_size, rejected_days, pending_days, deleted_days):
+    """Clear expired activation tokens and delete old rejected, unreviewed and soft-deleted accounts.
+
+    A retention of 0 days keeps those accounts. Each batch is its own transaction,
+    so the purge never holds the users table for long. Returns rows affected per kind.
+    """
+    now = datetime.now()
+    counts = {}
+
+    # An approval issues a fresh token when the stored one has expired, so nothing needs the old ones
+    counts['expired_tokens'] = _in_batches(
+        select(User.id).where(User.activation_token_expires < now), batch_size,
+        lambda ids: db.session.execute(
+            update(User).where(User.id.in_(ids)).values(activation_token=None, activation_token_expires=None),
+            execution_options={'synchronize_session': False}
+        )
+    )
+
+    for kind, days, condition in [
+        ('rejected_registrations', rejected_days, User.approval_status == 'rejected'),
+        ('pending_registrations', pending_days, User.approval_status == 'pending'),
+    ]:
+        counts[kind] = _in_batches(
+            select(User.id).where(condition, User.user_created_date < now - timedelta(days=days)),
+            batch_size, _delete_users
+        ) if days else 0
+
+    counts['deleted_accounts'] = _in_batches(
+        select(User.id).where(User.deleted_account_date < now - timedelta(days=deleted_days)),
+        batch_size, _delete_users
+    ) if deleted_days else 0
+
+    print("Purged: " + ', '.join(f"{count} {kind.replace('_', ' ')}" for kind, count in counts.items()) + '.')
+    return counts
+
+
+def optimize_database(vacuum_free_ratio):
+    """Refresh planner statistics and reclaim space in the way the database backend supports.
+
+    SQLite gets ANALYZE, and a VACUUM only once free pages exceed vacuum_free_ratio of
+    the file, since it rewrites the whole database under an exclusive lock.
+    PostgreSQL gets a plain VACUUM (ANALYZE) per table, which does not block reads or writes.
+    """
+    dialect = db.engine.dialect.name
+    # Neither VACUUM can run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        if dialect == 'sqlite':
+            conn.execute(text('ANALYZE'))
+            pages = conn.execute(text('PRAGMA page_count')).scalar()
+            free = conn.execute(text('PRAGMA freelist_count')).scalar()
+            print(f"Analyzed; {free} of {pages} page(s) free.")
+            if pages and free / pages >= vacuum_free_ratio:
+                conn.execute(text('VACUUM'))
+                print("Vacuumed.")
+        elif dialect == 'postgresql':
+            for table in ANALYZE_TABLES:
+                conn.execute(text(f'VACUUM (ANALYZE) {table}'))
+            print(f"Vacuumed and analyzed {len(ANALYZE_TABLES)} table(s).")
+        else:
+            conn.execute(text('ANALYZE'))
+            print("Analyzed.")
+
+
+def warm_dashboard():
+    """Compute the unfiltered dashboard, pipeline and trends so the next visitor gets cached results.
+
+    Trends are stored in the database. The others are stored in the shared cache,
+    so with the in-process memory backend only the worker running this benefits.
+    """
+    started = time.perf_counter()
+    cached_dashboard({})
+    model, query = record_source(include_archived=True)
+    query, active_filters = filter_records(query, {}, model)
+    pipeline_analytics(query, active_filters, model)
+    monthly_trends()
+    print(f"Dashboard warmed in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+
+def queue_dashboard_warm(app):
+    """Warm the dashboard in the background after a data load, so the next visitor does not wait."""
+    def warm():
+        with app.app_context():
+            try:
+                warm_dashboard()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Dashboard warm error: {e}")
+
+    _warm_queue.submit(warm)
@@ -0,0 +1,164 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request, Response, jsonify, abort
+from sqlalchemy import event, text
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from database import db
+
+# Metrics live in module scope so every worker registers them exactly once.
+# When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py), prometheus_client
+# writes the values to per-process files in that directory and /metrics merges them.
+REQUEST_LATENCY = Histogram(
+    'da11_request_duration_seconds', 'Request latency by endpoint and status',
+    ['endpoint', 'method', 'status']
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'da11_db_pool_checked_out', 'Database connections currently checked out', ['bind'],
+    multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'da11_db_pool_overflow', 'Database connections opened beyond the pool size', ['bind'],
+    multiprocess_mode='livesum'
+)
+EXPORT_DURATION = Histogram(
+    'da11_export_duration_seconds', 'Time taken to build an export file', ['format']
+)
+EXPORT_ROWS = Counter('da11_export_rows_total', 'Rows written to export files', ['format'])
+IMPORT_DURATION = Histogram('da11_import_duration_seconds', 'Time taken to process an upload')
+IMPORT_ROWS = Counter('da11_import_rows_total', 'Rows processed by uploads', ['outcome'])
+EMAIL_LATENCY = Histogram('da11_email_send_duration_seconds', 'Time taken to send an email')
+EMAIL_FAILURES = Counter('da11_email_failures_total', 'Emails that failed to send')
+CACHE_REQUESTS = Counter('da11_cache_requests_total', 'Cache lookups by namespace and result',
+                         ['namespace', 'result'])
+CACHE_EVICTIONS = Counter('da11_cache_evictions_total', 'Cache entries evicted to stay under the size limit')
+RATE_LIMITED = Counter('da11_rate_limited_total', 'Requests refused by the rate limiter',
+                       ['endpoint', 'scope'])
+
+
+class RecordStatusCollector:
+    """Report record counts per status straight from the database at scrape time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def collect(self):
+        family = GaugeMetricFamily('da11_records', 'Apprentice records by status', labels=['status'])
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                rows = conn.execute(text(
+                    'SELECT status, COUNT(*) FROM ('
+                    ' SELECT status FROM apprentice_records'
+                    ' UNION ALL SELECT status FROM apprentice_records_archive'
+                    ') AS all_records GROUP BY status'
+                )).all()
+        for status, count in rows:
+            family.add_metric([status or 'None'], count)
+        yield family
+
+
+def init_metrics(app):
+    """Register request timing, pool gauges and the /metrics and /healthz endpoints."""
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+
+    # Every bind, so the read replica's pool is reported alongside the primary's
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            _watch_pool(engine, bind or 'primary')
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None and request.endpoint != 'prometheus_metrics':
+            REQUEST_LATENCY.labels(
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code
+            ).observe(time.perf_counter() - start)
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Expose Prometheus metrics, merged across workers when running multiprocess."""
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+
+        records_registry = CollectorRegistry()
+        records_registry.register(RecordStatusCollector(app))
+
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        output = generate_latest(registry) + generate_latest(records_registry)
+        return Response(output, mimetype=CONTENT_TYPE_LATEST)
+
+    @app.route('/healthz')
+    def healthz():
+        """Lightweight liveness check that only verifies database connectivity."""
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        except Exception as e:
+            # The check is unauthenticated, so the details go to the log only
+            print(f"Health check database error: {e}")
+            return jsonify({'status': 'error', 'database': 'unavailable'}), 503
+        return jsonify({'status': 'ok'}), 200
+
+
+def _watch_pool(engine, bind):
+    """Track pool checkouts and overflow for one engine through SQLAlchemy pool events."""
+    pool = engine.pool
+    checked_out = DB_POOL_CHECKED_OUT.labels(bind=bind)
+    overflow = DB_POOL_OVERFLOW.labels(bind=bind)
+
+    def update_overflow():
+        if hasattr(pool, 'overflow'):
+            overflow.set(max(pool.overflow(), 0))
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_conn, conn_record, conn_proxy):
+        checked_out.inc()
+        update_overflow()
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_conn, conn_record):
+        checked_out.dec()
+        update_overflow()
+
+
+@contextmanager
+def track_export(fmt):
+    """Time an export build, failed or not; the caller reports the row count via the yielded callback."""
+    start = time.perf_counter()
+
+    def add_rows(count):
+        EXPORT_ROWS.labels(format=fmt).inc(count)
+
+    try:
+        yield add_rows
+    finally:
+        EXPORT_DURATION.labels(format=fmt).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_email():
+    """Time an email send and count it as a failure if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EMAIL_FAILURES.inc()
+        raise
+    finally:
+        EMAIL_LATENCY.observe(time.perf_counter() - start)
@@ -0,0 +1,288 @@
+import os
+from datetime import date, datetime
+import click
+from sqlalchemy import MetaData, case, delete, func, insert, select, text, update
+from sqlalchemy.schema import CreateIndex, CreateTable
+from database import db
+from models import SchemaMigration, MigrationCheckpoint
+from queries import date_add_days, EPA_WINDOW_DAYS
+
+
+class AddColumn:
+    """ALTER TABLE ... ADD COLUMN, skipped when the column exists. Nullable adds are metadata-only."""
+
+    def __init__(self, table, column, column_type):
+        self.table, self.column, self.column_type = table, column, column_type
+
+    def run(self, runner, version, step):
+        if self.column in runner.columns(self.table):
+            print(f"  '{self.table}.{self.column}' already exists.")
+        elif runner.dry_run:
+            print(f"  Would add column '{self.table}.{self.column}' ({self.column_type}).")
+        else:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {self.table} ADD COLUMN {self.column} {self.column_type}'))
+            print(f"  Added column '{self.table}.{self.column}'.")
+
+
+class DropColumn:
+    """ALTER TABLE ... DROP COLUMN, skipped when the column is already gone."""
+
+    def __init__(self, table, column):
+        self.table, self.column = table, column
+
+    def run(self, runner, version, step):
+        if self.column not in runner.columns(self.table):
+            print(f"  '{self.table}.{self.column}' does not exist.")
+        elif runner.dry_run:
+            print(f"  Would drop column '{self.table}.{self.column}'.")
+        else:
+            with db.engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {self.table} DROP COLUMN {self.column}'))
+            print(f"  Dropped column '{self.table}.{self.column}'.")
+
+
+class Backfill:
+    """Set-based UPDATE run in id-ordered batches, each committed with its checkpoint.
+
+    values(table) and where(table) build the SET values and the filter. Rows are
+    taken in primary key order after the last committed id, so each batch holds
+    its locks only briefly and a rerun continues where the last one stopped.
+    """
+
+    def __init__(self, table, values, where):
+        self.table, self.values, self.where = table, values, where
+
+    def run(self, runner, version, step):
+        table = db.metadata.tables[self.table]
+        condition = self.where(table)
+        checkpoint = MigrationCheckpoint.__table__
+        if runner.dry_run and not set(self.values(table)) <= set(runner.columns(self.table)):
+            # The column is added by an earlier step of this migration, so it cannot be queried yet
+            with db.engine.connect() as conn:
+                total = conn.scalar(select(func.count()).select_from(table))
+            print(f"  Would backfill the new column on up to {total} row(s) of '{self.table}'"
+                  f" in batches of {runner.batch_size}.")
+            return
+        with db.engine.connect() as conn:
+            last_id = conn.scalar(select(checkpoint.c.last_id).where(
+                checkpoint.c.version == version, checkpoint.c.step == step)) or 0
+            pending = conn.scalar(select(func.count()).select_from(table).where(table.c.id > last_id, condition))
+
+        resuming = f' (resuming after id {last_id})' if last_id else ''
+        if runner.dry_run:
+            print(f"  Would backfill {pending} row(s) of '{self.table}' in batches of {runner.batch_size}{resuming}.")
+            return
+        print(f"  Backfilling {pending} row(s) of '{self.table}'{resuming}...")
+
+        done = 0
+        while True:
+            with db.engine.begin() as conn:
+                batch = select(table.c.id).where(table.c.id > last_id, condition).order_by(table.c.id)
+                upper = conn.scalar(select(func.max(batch.limit(runner.batch_size).subquery().c.id)))
+                if upper is None:
+                    break
+                result = conn.execute(
+                    update(table)
+                    .where(table.c.id > last_id, table.c.id <= upper, condition)
+                    .values(**self.values(table))
+                )
+                saved = conn.execute(
+                    update(checkpoint)
+                    .where(checkpoint.c.version == version, checkpoint.c.step == step)
+                    .values(last_id=upper)
+                )
+                if saved.rowcount == 0:
+                    conn.execute(insert(checkpoint).values(version=version, step=step, last_id=upper))
+            done += result.rowcount
+            last_id = upper
+            print(f"    {done}/{pending} row(s) updated (id <= {upper})")
+        print(f"  {done} row(s) backfilled.")
+
+
+class CreateModelIndex:
+    """Create an index declared on a model table, concurrently on PostgreSQL."""
+
+    def __init__(self, table, name):
+        self.table, self.name = table, name
+
+    def run(self, runner, version, step):
+        index = next(ix for ix in db.metadata.tables[self.table].indexes if ix.name == self.name)
+        existing = [ix['name'] for ix in db.inspect(db.engine).get_indexes(self.table)]
+        if self.name in existing:
+            print(f"  Index '{self.name}' already exists.")
+        elif runner.dry_run:
+            print(f"  Would create index '{self.name}'.")
+        elif db.engine.dialect.name == 'postgresql':
+            # CONCURRENTLY avoids blocking writes but cannot run inside a transaction
+            ddl = str(CreateIndex(index).compile(dialect=db.engine.dialect)).replace(' INDEX ', ' INDEX CONCURRENTLY ', 1)
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text(ddl))
+            print(f"  Created index '{self.name}'.")
+        else:
+            index.create(db.engine)
+            print(f"  Created index '{self.name}'.")
+
+
+class RebuildWithAutoincrement:
+    """Recreate a SQLite table as its model declares it, with AUTOINCREMENT, keeping its rows.
+
+    SQLite can only add AUTOINCREMENT by copying the table. The id sequence is then
+    set above the largest id in the table and in shared_ids_with, so ids that
+    left the table for one of those are never handed out again. The whole rebuild
+    is one transaction. Other databases never reuse ids, so they are skipped.
+    """
+
+    def __init__(self, table, shared_ids_with=()):
+        self.table, self.shared_ids_with = table, list(shared_ids_with)
+
+    def run(self, runner, version, step):
+        if db.engine.dialect.name != 'sqlite':
+            print(f"  '{self.table}' needs no rebuild on {db.engine.dialect.name}.")
+            return
+        with db.engine.connect() as conn:
+            ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {'name': self.table})
+        if 'AUTOINCREMENT' in ddl.upper():
+            print(f"  '{self.table}' already uses AUTOINCREMENT.")
+            return
+        if runner.dry_run:
+            print(f"  Would rebuild '{self.table}' with AUTOINCREMENT.")
+            return
+
+        table = db.metadata.tables[self.table]
+        rebuild = table.to_metadata(MetaData(), name=f'{self.table}_rebuild')
+        columns = ', '.join(col for col in runner.columns(self.table) if col in table.c)
+        highest = ' UNION ALL '.join(f'SELECT MAX(id) AS id FROM {name}' for name in [self.table] + self.shared_ids_with)
+        script = [
+            'BEGIN IMMEDIATE',
+            str(CreateTable(rebuild).compile(dialect=db.engine.dialect)),
+            f'INSERT INTO {rebuild.name} ({columns}) SELECT {columns} FROM {self.table}',
+            f'DROP TABLE {self.table}',
+            f'ALTER TABLE {rebuild.name} RENAME TO {self.table}',
+            *[str(CreateIndex(index).compile(dialect=db.engine.dialect)) for index in table.indexes],
+            f"DELETE FROM sqlite_sequence WHERE name = '{self.table}'",
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{self.table}', COALESCE(MAX(id), 0) FROM ({highest})",
+            'COMMIT',
+        ]
+        # pysqlite would commit before each DDL statement, so run the script as one explicit transaction
+        conn = db.engine.raw_connection()
+        try:
+            conn.driver_connection.executescript(';\n'.join(script) + ';')
+        finally:
+            conn.close()
+        print(f"  Rebuilt '{self.table}' with AUTOINCREMENT.")
+
+
+# Ordered schema history. Append new migrations with the next version number;
+# never renumber or edit one that has shipped.
+MIGRATIONS = [
+    (1, 'add_roles', [
+        AddColumn('users', 'role', 'VARCHAR(20)'),
+        Backfill('users',
+                 values=lambda t: {'role': case((func.lower(t.c.username) == 'admin', 'admin'), else_='viewer')},
+                 where=lambda t: t.c.role.is_(None)),
+    ]),
+    (2, 'add_deleted_date', [
+        AddColumn('users', 'deleted_account_date', 'DATETIME'),
+    ]),
+    (3, 'add_approval_status', [
+        AddColumn('users', 'approval_status', 'VARCHAR(20)'),
+        Backfill('users', values=lambda t: {'approval_status': 'approved'},
+                 where=lambda t: t.c.approval_status.is_(None)),
+    ]),
+    (4, 'remove_terms_consent', [
+        DropColumn('users', 'terms_consent_date'),
+    ]),
+    (5, 'add_window_closure', [
+        AddColumn('apprentice_records', 'epa_window_closes', 'DATE'),
+        Backfill('apprentice_records',
+                 values=lambda t: {'epa_window_closes': date_add_days(t.c.approved_for_epa, EPA_WINDOW_DAYS)},
+                 where=lambda t: t.c.approved_for_epa.isnot(None) & t.c.epa_window_closes.is_(None)),
+        CreateModelIndex('apprentice_records', 'ix_apprentice_records_open_window_closes'),
+    ]),
+    (6, 'add_status_updated_date', [
+        AddColumn('apprentice_records', 'status_updated_date', 'DATE'),
+        # Existing records have no status history, so they count as changed today
+        Backfill('apprentice_records', values=lambda t: {'status_updated_date': date.today()},
+                 where=lambda t: t.c.status_updated_date.is_(None)),
+        CreateModelIndex('apprentice_records', 'ix_apprentice_records_status_updated_date'),
+    ]),
+    (7, 'add_ace360_index', [
+        CreateModelIndex('apprentice_records', 'ix_apprentice_records_ace360_id'),
+        CreateModelIndex('apprentice_records_archive', 'ix_apprentice_records_archive_ace360_id'),
+    ]),
+    (8, 'never_reuse_record_ids', [
+        RebuildWithAutoincrement('apprentice_records', shared_ids_with=['apprentice_records_archive']),
+    ]),
+]
+
+
+class MigrationRunner:
+    """Applies pending MIGRATIONS in order and records each one in schema_migrations."""
+
+    def __init__(self, batch_size, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+    def columns(self, table):
+        # A fresh inspector each time, since earlier steps may have altered the table
+        return [col['name'] for col in db.inspect(db.engine).get_columns(table)]
+
+    def applied(self):
+        migrations = SchemaMigration.__table__
+        with db.engine.connect() as conn:
+            return {version for (version,) in conn.execute(select(migrations.c.version))}
+
+    def run(self, target=None):
+        """Apply pending migrations up to target (default: all). Returns how many ran."""
+        applied = self.applied()
+        pending = [m for m in MIGRATIONS if m[0] not in applied and (target is None or m[0] <= target)]
+        for version, name, steps in pending:
+            print(f"{'[dry run] ' if self.dry_run else ''}Migration {version}: {name}")
+            for step, operation in enumerate(steps):
+                operation.run(self, version, step)
+            if not self.dry_run:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(SchemaMigration.__table__).values(
+                        version=version, name=name, applied_at=datetime.now()))
+                    conn.execute(delete(MigrationCheckpoint.__table__)
+                                 .where(MigrationCheckpoint.__table__.c.version == version))
+        return len(pending)
+
+
+def schema_version():
+    """Highest applied migration version, or 0 for an unmigrated database."""
+    with db.engine.connect() as conn:
+        return conn.scalar(select(func.max(SchemaMigration.__table__.c.version))) or 0
+
+
+def init_migrations(app):
+    """Register the migrate and migrate-status CLI commands."""
+    app.config.setdefault('MIGRATION_BATCH_SIZE', int(os.environ.get('MIGRATION_BATCH_SIZE', 1000)))
+
+    @app.cli.command('migrate')
+    @click.option('--dry-run', is_flag=True, help='Show what each pending migration would do without changing anything.')
+    @click.option('--batch-size', type=int, default=None, help='Rows updated per committed backfill batch.')
+    @click.option('--target', type=int, default=None, help='Stop after this migration version.')
+    def migrate_command(dry_run, batch_size, target):
+        """Apply pending schema migrations. Safe to rerun after an interruption."""
+        runner = MigrationRunner(batch_size or app.config['MIGRATION_BATCH_SIZE'], dry_run=dry_run)
+        ran = runner.run(target)
+        if not ran:
+            print(f"Schema is up to date at version {schema_version()}.")
+        elif dry_run:
+            print(f"{ran} migration(s) pending; nothing was changed.")
+        else:
+            print(f"Applied {ran} migration(s); schema is now at version {schema_version()}.")
+
+    @app.cli.command('migrate-status')
+    def migrate_status_command():
+        """List migrations and whether each has been applied."""
+        migrations = SchemaMigration.__table__
+        with db.engine.connect() as conn:
+            applied = dict(conn.execute(select(migrations.c.version, migrations.c.applied_at)).all())
+        for version, name, _ in MIGRATIONS:
+            status = f"applied {applied[version]:%Y-%m-%d %H:%M}" if version in applied else 'pending'
+            print(f"{version:>4}  {name:<28}{status}")
+        print(f"Schema version: {schema_version()}")
@@ -1,15 +1,35 @@
 from database import db
+from sqlalchemy import event
 from datetime import date, datetime, timedelta
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from itsdangerous import URLSafeTimedSerializer
+from passwords import hash_password, needs_rehash
 
 
-class ApprenticeRecord(db.Model):
-    __tablename__ = 'apprentice_records'
+# Status options for dropdown, in pipeline order
+STATUS_OPTIONS = [
+    'In Training',
+    'Gateway in Progress',
+    'Gateway Evidence Complete',
+    'Gateway Submitted',
+    'Denied EPA',
+    'Approved for EPA',
+    'EPA in Progress',
+    'EPA Evidence Complete',
+    'EPA Failed',
+    'EPA Passed'
+]
+
+# Statuses at the end of the pipeline
+CLOSED_STATUSES = ['EPA Failed', 'EPA Passed']
+
+
+class ApprenticeRecordColumns:
+    """Columns and calculated fields shared by live and archived apprentice records."""
 
     id = db.Column(db.Integer, primary_key=True)
-    ace360_id = db.Column(db.Integer, nullable=False)
+    ace360_id = db.Column(db.Integer, nullable=False, index=True)
     status = db.Column(db.String(50), nullable=True)
     gateway_submitted = db.Column(db.Date, nullable=True)
     approved_for_epa = db.Column(db.Date, nullable=True)
@@ -19,6 +39,10 @@ class ApprenticeRecord(db.Model):
     second_attempt_date = db.Column(db.Date, nullable=True)
     overall_grade = db.Column(db.String(50), nullable=True)
     grade_date = db.Column(db.Date, nullable=True)
+    # Stored copy of approved_for_epa + 84 days so the at-risk worklist is an index range scan
+    epa_window_closes = db.Column(db.Date, nullable=True)
+    # Date the status last changed, for finding records stalled in one status
+    status_updated_date = db.Column(db.Date, nullable=True, index=True)
 
     @property
     def variance_days(self):
@@ -43,10 +67,59 @@ class ApprenticeRecord(db.Model):
             return "Yes" if days_diff <= 84 else "No"
         return None
 
+
+class ApprenticeRecord(ApprenticeRecordColumns, db.Model):
+    __tablename__ = 'apprentice_records'
+
+    __table_args__ = (
+        db.Index(
+            'ix_apprentice_records_open_window_closes', 'epa_window_closes',
+            sqlite_where=db.text('grade_date IS NULL'),
+            postgresql_where=db.text('grade_date IS NULL')
+        ),
+        # Never reuse ids on SQLite, since archived records keep theirs
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<ApprenticeRecord {self.ace360_id}>'
 
 
+class ArchivedApprenticeRecord(ApprenticeRecordColumns, db.Model):
+    """Completed records moved out of apprentice_records by the archive job."""
+    __tablename__ = 'apprentice_records_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedApprenticeRecord {self.ace360_id}>'
+
+
+@event.listens_for(ApprenticeRecord, 'before_insert')
+@event.listens_for(ApprenticeRecord, 'before_update')
+def set_epa_window_closes(mapper, connection, record):
+    """Keep the stored EPA window closure date in step with approved_for_epa."""
+    if record.approved_for_epa:
+        record.epa_window_closes = record.approved_for_epa + timedelta(days=84)
+    else:
+        record.epa_window_closes = None
+
+
+@event.listens_for(ApprenticeRecord, 'before_insert')
+def set_initial_status_date(mapper, connection, record):
+    """Stamp the status date on new records."""
+    if record.status_updated_date is None:
+        record.status_updated_date = date.today()
+
+
+@event.listens_for(ApprenticeRecord, 'before_update')
+def set_status_updated_date(mapper, connection, record):
+    """Stamp the status date whenever the status changes."""
+    if db.inspect(record).attrs.status.history.has_changes():
+        record.status_updated_date = date.today()
+
+
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
 
@@ -72,13 +145,17 @@ class User(UserMixin, db.Model):
     approval_status = db.Column(db.String(20), nullable=True, default='pending')
 
     def set_password(self, password):
-        """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set the user's password with the configured method."""
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
         """Check if the provided password matches the hash."""
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        """Check if the stored hash predates the configured hash method or salt length."""
+        return needs_rehash(self.password_hash)
+
     def generate_activation_token(self, serializer, salt='account-activation-salt'):
         """Generate an activation token for this user."""
         self.activation_token = serializer.dumps(self.email, salt=salt)
@@ -113,3 +190,78 @@ class User(UserMixin, db.Model):
 
     def __repr__(self):
         return f'<User {self.forename} {self.surname}>'
+
+
+class TrendMonth(db.Model):
+    """Cached cohort trend figures for one closed month of approved_for_epa."""
+    __tablename__ = 'trend_months'
+
+    month = db.Column(db.String(7), primary_key=True)
+    payload = db.Column(db.Text, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<TrendMonth {self.month}>'
+
+
+class DataVersion(db.Model):
+    """Counter bumped in the same transaction as every write to a table group."""
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<DataVersion {self.name}={self.version}>'
+
+
+class DigestLog(db.Model):
+    """One row per admin per day the digest email was sent, so reruns skip them."""
+    __tablename__ = 'digest_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest_date = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('digest_date', 'user_id', name='uq_digest_log_date_user'),
+    )
+
+    def __repr__(self):
+        return f'<DigestLog {self.digest_date} user={self.user_id}>'
+
+
+class SchemaMigration(db.Model):
+    """One row per migration applied by `flask --app app migrate`."""
+    __tablename__ = 'schema_migrations'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version} {self.name}>'
+
+
+class MigrationCheckpoint(db.Model):
+    """Last id a batched backfill has committed, so an interrupted run resumes after it."""
+    __tablename__ = 'migration_checkpoints'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    step = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    last_id = db.Column(db.Integer, nullable=False)
+
+
+class MaintenanceLock(db.Model):
+    """Lease held by whichever worker or cron job is running maintenance, plus when it last finished."""
+    __tablename__ = 'maintenance_locks'
+
+    name = db.Column(db.String(50), primary_key=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    holder = db.Column(db.String(100), nullable=True)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<MaintenanceLock {self.name} until={self.locked_until}>'
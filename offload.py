@@ -0,0 +1,156 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from flask import current_app, has_request_context, request
+from metrics import track_email, EMAIL_FAILURES
+
+# Per-process pools, created on first use so each gunicorn worker gets its own after the fork
+_pools = {'pid': None, 'email': None, 'render': None, 'email_slots': None,
+          'render_worked': False, 'in_process_pid': None}
+_pools_lock = threading.Lock()
+
+# Forking a threaded worker can copy locks held mid-request into the child. A
+# forkserver forks from a clean single-threaded process that has already imported
+# the export builders, so renders start fast without inheriting any of that.
+_start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+process_context = multiprocessing.get_context(_start_method)
+if _start_method == 'forkserver':
+    process_context.set_forkserver_preload(['exports'])
+
+
+def init_offload(app):
+    """Configure the bounded pools that take SMTP sends and export rendering off request threads."""
+    app.config.setdefault('EMAIL_WORKERS', int(os.environ.get('EMAIL_WORKERS', 2)))
+    app.config.setdefault('EMAIL_QUEUE_SIZE', int(os.environ.get('EMAIL_QUEUE_SIZE', 100)))
+    app.config.setdefault('EXPORT_RENDER_WORKERS',
+                          int(os.environ.get('EXPORT_RENDER_WORKERS', min(2, os.cpu_count() or 1))))
+
+
+def _pool(kind):
+    with _pools_lock:
+        if _pools['pid'] != os.getpid():
+            config = current_app.config
+            _pools['email'] = ThreadPoolExecutor(max_workers=config['EMAIL_WORKERS'], thread_name_prefix='email')
+            _pools['email_slots'] = threading.BoundedSemaphore(config['EMAIL_QUEUE_SIZE'])
+            _pools['render'] = None
+            _pools['render_worked'] = False
+            _pools['pid'] = os.getpid()
+        if kind == 'render' and _pools['render'] is None:
+            _pools['render'] = ProcessPoolExecutor(max_workers=current_app.config['EXPORT_RENDER_WORKERS'],
+                                                   mp_context=process_context)
+        return _pools[kind]
+
+
+def processes_usable():
+    """Whether work can go to process pools here, or must run in this process; see processes_broken."""
+    return _pools['in_process_pid'] != os.getpid()
+
+
+def processes_broken(error):
+    """Handle a BrokenProcessPool; the caller then does the work in this process.
+
+    If no render has finished in a pool yet, the processes are taken to be unable
+    to start at all, most often because the entry point has no
+    ``if __name__ == '__main__':`` guard and re-runs in the child, so later work
+    stays in this process. Otherwise a child crashed and the render pool is replaced.
+    """
+    with _pools_lock:
+        broken, _pools['render'] = _pools['render'], None
+        if not _pools['render_worked'] and processes_usable():
+            _pools['in_process_pid'] = os.getpid()
+            print(f"Process pool could not start ({error}); rendering and hashing in-process. "
+                  f"Guard the entry point with if __name__ == '__main__': to use the pool.")
+    if broken is not None:
+        broken.shutdown(wait=False)
+
+
+def queue_email(msg):
+    """Send msg from the email pool, so the request does not wait on SMTP. See queue_emails."""
+    queue_emails([msg])
+
+
+def queue_emails(messages):
+    """Send messages from the email pool over one SMTP connection, so the request does not wait on SMTP.
+
+    The request has already answered by the time a background send fails, so
+    failures are counted in EMAIL_FAILURES and logged with the route that queued
+    them. Each call takes one of EMAIL_QUEUE_SIZE slots; when none is free, the
+    messages are sent inline instead and errors reach the caller.
+    """
+    if not messages:
+        return
+    app = current_app._get_current_object()
+    route = request.endpoint if has_request_context() else None
+    pool = _pool('email')
+    slots = _pools['email_slots']
+    if not slots.acquire(blocking=False):
+        with app.extensions['mail'].connect() as conn:
+            for msg in messages:
+                with track_email():
+                    conn.send(msg)
+        return
+
+    def send():
+        handled = 0
+        try:
+            with app.app_context(), app.extensions['mail'].connect() as conn:
+                for msg in messages:
+                    handled += 1
+                    try:
+                        with track_email():
+                            conn.send(msg)
+                    except Exception as e:
+                        print(f"Email error in {route or 'background'} for {msg.recipients[0]}: {e}")
+        except Exception as e:
+            # The mail server could not be reached, so the rest of the batch was never tried
+            EMAIL_FAILURES.inc(len(messages) - handled)
+            print(f"Email error in {route or 'background'}: {e}")
+        finally:
+            slots.release()
+
+    pool.submit(send)
+
+
+def submit_render(builder, headers, rows):
+    """Queue builder(headers, rows) on the render process pool and return its future.
+
+    Renders here, returning a finished future, when the pool cannot be used.
+    """
+    if processes_usable():
+        try:
+            future = _pool('render').submit(builder, headers, rows)
+            future.add_done_callback(_render_finished)
+            return future
+        except BrokenProcessPool as error:
+            processes_broken(error)
+    return render_here(builder, headers, rows)
+
+
+def _render_finished(future):
+    if not future.cancelled() and future.exception() is None:
+        _pools['render_worked'] = True
+
+
+def render_here(builder, headers, rows):
+    """Run builder(headers, rows) in this process, as a finished future like submit_render's."""
+    future = Future()
+    try:
+        future.set_result(builder(headers, rows))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def render_in_pool(builder, headers, rows):
+    """Run builder(headers, rows) in the render process pool and wait for the file.
+
+    The waiting thread holds no GIL, so the worker's other threads keep serving
+    requests, and at most EXPORT_RENDER_WORKERS files render at once.
+    """
+    try:
+        return submit_render(builder, headers, rows).result()
+    except BrokenProcessPool as error:
+        processes_broken(error)
+        return render_here(builder, headers, rows).result()
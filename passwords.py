@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import click
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+
+# Strength rule for new passwords, shared by /register and the user import
+PASSWORD_PATTERN = r'^(?=.*[A-Z])(?=.*\d)(?=.*[@$!%*?&#])[A-Za-z\d@$!%*?&#]{8,}$'
+
+# Settings compared by benchmark-hashing when no --method is given
+BENCHMARK_METHODS = [
+    'scrypt:16384:8:1', 'scrypt:32768:8:1', 'scrypt:65536:8:1',
+    'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000',
+]
+
+
+def init_passwords(app):
+    """Configure the password hash method and register the benchmark-hashing command."""
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+    app.config.setdefault('PASSWORD_SALT_LENGTH',
+                          int(os.environ.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH)))
+    # Fail at startup rather than on the first login
+    app.config['PASSWORD_HASH_METHOD'] = canonical_method(app.config['PASSWORD_HASH_METHOD'])
+
+    @app.cli.command('benchmark-hashing')
+    @click.option('--method', 'methods', multiple=True,
+                  help='Hash method to time, e.g. scrypt:32768:8:1 or pbkdf2:sha256:600000. Repeatable.')
+    @click.option('--rounds', type=int, default=5, help='Hashes to time per method.')
+    def benchmark_hashing_command(methods, rounds):
+        """Report per-hash latency for candidate password hash settings on this machine."""
+        configured = app.config['PASSWORD_HASH_METHOD']
+        candidates = [canonical_method(m) for m in methods] or sorted(set(BENCHMARK_METHODS + [configured]))
+        print(f"{'Method':<28}{'Mean ms':>10}{'Min ms':>10}{'Max ms':>10}")
+        for method in candidates:
+            timings = benchmark(method, rounds, app.config['PASSWORD_SALT_LENGTH'])
+            marker = '  (configured)' if method == configured else ''
+            print(f"{method:<28}{sum(timings) / len(timings):>10.1f}{min(timings):>10.1f}{max(timings):>10.1f}{marker}")
+
+
+def canonical_method(method):
+    """Expand a werkzeug hash method to the full form stored in hashes, e.g. 'scrypt' -> 'scrypt:32768:8:1'."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Unsupported password hash method '{method}'.")
+
+
+def _settings():
+    if has_app_context():
+        return (current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+                current_app.config.get('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH))
+    return DEFAULT_METHOD, DEFAULT_SALT_LENGTH
+
+
+def is_strong_password(password):
+    """Check a new password against PASSWORD_PATTERN."""
+    return re.match(PASSWORD_PATTERN, password) is not None
+
+
+def hash_password(password, method=None, salt_length=None):
+    """Hash a password with the configured method, unless one is given."""
+    configured_method, configured_salt_length = _settings()
+    return generate_password_hash(password, method=method or configured_method,
+                                  salt_length=salt_length or configured_salt_length)
+
+
+def needs_rehash(password_hash):
+    """True when a stored hash was made with a method or salt length other than the configured one."""
+    method, configured_salt_length = _settings()
+    stored_method, _, rest = password_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return stored_method != method or len(salt) != configured_salt_length
+
+
+def benchmark(method, rounds, salt_length=DEFAULT_SALT_LENGTH):
+    """Milliseconds taken by each of rounds hashes with method."""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        generate_password_hash('Benchmark1!password', method=method, salt_length=salt_length)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import logging
+import cProfile
+from collections import Counter
+from datetime import datetime
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('da11.profiling')
+
+
+def init_profiling(app):
+    """Attach the opt-in request instrumentation layer to the Flask app."""
+    app.config.setdefault('PROFILING_ENABLED', os.environ.get('PROFILING_ENABLED', '0') == '1')
+    app.config.setdefault('PROFILING_SLOW_MS', float(os.environ.get('PROFILING_SLOW_MS', 500)))
+    app.config.setdefault('PROFILING_DIR', os.environ.get('PROFILING_DIR', 'profiles'))
+    app.config.setdefault('PROFILING_HEADER', 'X-Profile')
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    # Listen on the Engine class so every bind (primary or replica) is counted
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_profile():
+        g._profile = {
+            'start': time.perf_counter(),
+            'sql_count': 0,
+            'sql_time': 0.0,
+            'statements': Counter(),
+            'template_time': 0.0,
+            'template_start': [],
+        }
+        if request.headers.get(app.config['PROFILING_HEADER']) and _is_admin():
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+    @app.after_request
+    def finish_request_profile(response):
+        stats = g.pop('_profile', None)
+        if stats is None:
+            return response
+
+        profiler = g.pop('_profiler', None)
+        profile_path = None
+        if profiler is not None:
+            profiler.disable()
+            profile_path = _dump_profile(app, profiler)
+
+        wall_ms = (time.perf_counter() - stats['start']) * 1000
+        sql_ms = stats['sql_time'] * 1000
+        template_ms = stats['template_time'] * 1000
+
+        response.headers['Server-Timing'] = (
+            f'app;dur={wall_ms:.1f}, db;dur={sql_ms:.1f};desc="{stats["sql_count"]} queries", '
+            f'tpl;dur={template_ms:.1f}'
+        )
+
+        if wall_ms >= app.config['PROFILING_SLOW_MS'] or profile_path:
+            entry = {
+                'event': 'slow_request' if wall_ms >= app.config['PROFILING_SLOW_MS'] else 'profiled_request',
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'wall_ms': round(wall_ms, 1),
+                'sql_count': stats['sql_count'],
+                'sql_ms': round(sql_ms, 1),
+                'template_ms': round(template_ms, 1),
+                'response_bytes': response.calculate_content_length(),
+                # Statements repeated within one request are the usual N+1 signature
+                'repeated_sql': [
+                    {'count': count, 'statement': statement}
+                    for statement, count in stats['statements'].most_common(5) if count > 1
+                ],
+            }
+            if profile_path:
+                entry['profile'] = profile_path
+            logger.warning(json.dumps(entry))
+
+        return response
+
+
+def _is_admin():
+    """Check the current user is an admin without failing outside a login."""
+    return current_user.is_authenticated and current_user.is_admin()
+
+
+def _dump_profile(app, profiler):
+    """Write the cProfile stats for this request and return the file path."""
+    os.makedirs(app.config['PROFILING_DIR'], exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('.', '_')
+    path = os.path.join(
+        app.config['PROFILING_DIR'],
+        f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}-{os.getpid()}.prof"
+    )
+    profiler.dump_stats(path)
+    return path
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get('_profile')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is not None:
+        conn.info.setdefault('_profile_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None:
+        return
+    starts = conn.info.get('_profile_start')
+    if not starts:
+        return
+    stats['sql_time'] += time.perf_counter() - starts.pop()
+    stats['sql_count'] += 1
+    stats['statements'][' '.join(statement.split())[:200]] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None:
+        stats['template_start'].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None and stats['template_start']:
+        stats['template_time'] += time.perf_counter() - stats['template_start'].pop()
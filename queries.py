@@ -0,0 +1,354 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, case, and_, or_, false, select, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Date, Float, String
+from database import db
+from models import ApprenticeRecord, ArchivedApprenticeRecord, CLOSED_STATUSES
+
+# EPA window length: EPA Ready date + 84 days (12 weeks)
+EPA_WINDOW_DAYS = 84
+
+# Largest value an Integer ace360_id column can hold
+ACE360_ID_MAX = 2 ** 31 - 1
+
+# Date range filters: (query parameter prefix, model field)
+DATE_FILTERS = [
+    ('gateway', 'gateway_submitted'),
+    ('approved', 'approved_for_epa'),
+    ('project_start', 'project_start_date'),
+    ('deadline', 'project_deadline_date'),
+    ('first_attempt', 'first_attempt_date'),
+    ('second_attempt', 'second_attempt_date'),
+    ('grade_date', 'grade_date'),
+]
+
+
+class date_add_days(FunctionElement):
+    """SQL expression for a date column plus a number of days, portable across backends."""
+    type = Date()
+    name = 'date_add_days'
+    inherit_cache = True
+
+
+@compiles(date_add_days)
+def _date_add_days_default(element, compiler, **kw):
+    date_expr, days = list(element.clauses)
+    return f'({compiler.process(date_expr, **kw)} + {compiler.process(days, **kw)})'
+
+
+@compiles(date_add_days, 'sqlite')
+def _date_add_days_sqlite(element, compiler, **kw):
+    date_expr, days = list(element.clauses)
+    return f"date({compiler.process(date_expr, **kw)}, '+' || {compiler.process(days, **kw)} || ' days')"
+
+
+class days_between(FunctionElement):
+    """SQL expression for the number of days from the second date to the first."""
+    type = Float()
+    name = 'days_between'
+    inherit_cache = True
+
+
+@compiles(days_between)
+def _days_between_default(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return f'({compiler.process(end, **kw)} - {compiler.process(start, **kw)})'
+
+
+@compiles(days_between, 'sqlite')
+def _days_between_sqlite(element, compiler, **kw):
+    end, start = list(element.clauses)
+    return f'(julianday({compiler.process(end, **kw)}) - julianday({compiler.process(start, **kw)}))'
+
+
+class month_bucket(FunctionElement):
+    """SQL expression for the 'YYYY-MM' month a date falls in."""
+    type = String()
+    name = 'month_bucket'
+    inherit_cache = True
+
+
+@compiles(month_bucket)
+def _month_bucket_default(element, compiler, **kw):
+    return f"to_char({compiler.process(element.clauses, **kw)}, 'YYYY-MM')"
+
+
+@compiles(month_bucket, 'sqlite')
+def _month_bucket_sqlite(element, compiler, **kw):
+    return f"strftime('%Y-%m', {compiler.process(element.clauses, **kw)})"
+
+
+def parse_date(date_string):
+    """Parse date string to date object, return None if empty or invalid."""
+    if not date_string:
+        return None
+    try:
+        return datetime.strptime(date_string, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def count_business_days(start_date, end_date):
+    """Count business days (excluding weekends) between two dates."""
+    if not start_date or not end_date:
+        return None
+    if end_date < start_date:
+        return 0
+    count = 0
+    current = start_date
+    while current <= end_date:
+        if current.weekday() < 5:  # Monday = 0, Friday = 4
+            count += 1
+        current += timedelta(days=1)
+    return count
+
+
+def combined_records():
+    """ApprenticeRecord entity over live and archived rows, for whole-history reporting.
+
+    Query it with db.session.query(model) and pass it as the model argument of the
+    helpers below. Rows loaded through it are read-only snapshots.
+    """
+    columns = [column.name for column in ApprenticeRecord.__table__.columns]
+    live = select(*[ApprenticeRecord.__table__.c[name] for name in columns])
+    archived = select(*[ArchivedApprenticeRecord.__table__.c[name] for name in columns])
+    return aliased(ApprenticeRecord, union_all(live, archived).subquery('all_apprentice_records'))
+
+
+def record_source(include_archived):
+    """Return (model, query) over live records, or over live and archived records."""
+    if include_archived:
+        model = combined_records()
+        return model, db.session.query(model)
+    return ApprenticeRecord, ApprenticeRecord.query
+
+
+def within_window_clause(model=ApprenticeRecord):
+    """SQL equivalent of ApprenticeRecord.within_epa_window == 'Yes'."""
+    return and_(
+        model.grade_date.isnot(None),
+        model.approved_for_epa.isnot(None),
+        model.grade_date <= date_add_days(model.approved_for_epa, EPA_WINDOW_DAYS)
+    )
+
+
+def beyond_window_clause(model=ApprenticeRecord):
+    """SQL equivalent of ApprenticeRecord.within_epa_window == 'No'."""
+    return and_(
+        model.grade_date.isnot(None),
+        model.approved_for_epa.isnot(None),
+        model.grade_date > date_add_days(model.approved_for_epa, EPA_WINDOW_DAYS)
+    )
+
+
+def ace360_id_ranges(search):
+    """Inclusive (low, high) ace360_id ranges for a search: exact, or prefix with a trailing '*'.
+
+    ace360_id is an integer, so a prefix such as 123* becomes one range per possible
+    length (123, 1230-1239, 12300-12399, ...), each of which the ace360_id index can
+    answer without scanning the table. Returns None for an invalid or out-of-range search.
+    """
+    search = search.strip()
+    prefix = search.endswith('*')
+    digits = search.rstrip('*')
+    # isdigit() alone accepts characters such as '²' that int() rejects
+    if not (digits.isascii() and digits.isdigit()) or (prefix and len(digits) > 1 and digits.startswith('0')):
+        return None
+    value = int(digits)
+    if value > ACE360_ID_MAX:
+        return None
+    ranges = [(value, value)]
+    # No other id starts with 0, so 0* is the exact id 0
+    if prefix and value:
+        scale = 10
+        while value * scale <= ACE360_ID_MAX:
+            ranges.append((value * scale, min((value + 1) * scale - 1, ACE360_ID_MAX)))
+            scale *= 10
+    return ranges
+
+
+def ace360_id_clause(search, model=ApprenticeRecord):
+    """SQL condition for an ACE360 ID search, see ace360_id_ranges."""
+    ranges = ace360_id_ranges(search)
+    if ranges is None:
+        return false()
+    return or_(*[
+        model.ace360_id == low if low == high else model.ace360_id.between(low, high)
+        for low, high in ranges
+    ])
+
+
+def filter_records(query, args, model=ApprenticeRecord):
+    """Apply the /records filter parameters to a query.
+
+    Returns the filtered query and the dict of active filters for templates.
+    """
+    active_filters = {}
+
+    # ACE360 ID search
+    ace360_search = args.get('ace360_id', '').strip()
+    if ace360_search:
+        query = query.filter(ace360_id_clause(ace360_search, model))
+        active_filters['ace360_id'] = ace360_search
+
+    # Status filter
+    status_filter = args.get('status')
+    if status_filter:
+        query = query.filter(model.status == status_filter)
+        active_filters['status'] = status_filter
+
+    # Grade filter
+    grade_filter = args.get('grade')
+    if grade_filter:
+        query = query.filter(model.overall_grade == grade_filter)
+        active_filters['grade'] = grade_filter
+
+    # Within EPA Window filter
+    window_filter = args.get('window')
+    if window_filter:
+        if window_filter == 'Yes':
+            query = query.filter(within_window_clause(model))
+        elif window_filter == 'No':
+            query = query.filter(beyond_window_clause(model))
+        else:
+            query = query.filter(false())
+        active_filters['window'] = window_filter
+
+    for filter_prefix, model_field in DATE_FILTERS:
+        from_date = args.get(f'{filter_prefix}_from')
+        to_date = args.get(f'{filter_prefix}_to')
+
+        if from_date:
+            parsed_from = parse_date(from_date)
+            if parsed_from:
+                query = query.filter(getattr(model, model_field) >= parsed_from)
+                active_filters[f'{filter_prefix}_from'] = from_date
+
+        if to_date:
+            parsed_to = parse_date(to_date)
+            if parsed_to:
+                query = query.filter(getattr(model, model_field) <= parsed_to)
+                active_filters[f'{filter_prefix}_to'] = to_date
+
+    return query, active_filters
+
+
+def at_risk_records(days_remaining, include_overdue=False, model=ApprenticeRecord):
+    """Ungraded records whose EPA window closes within days_remaining days.
+
+    Served by the partial index on epa_window_closes WHERE grade_date IS NULL.
+    """
+    today = date.today()
+    query = model.query.filter(
+        model.grade_date.is_(None),
+        model.epa_window_closes <= today + timedelta(days=days_remaining)
+    )
+    if include_overdue:
+        query = query.filter(model.epa_window_closes.isnot(None))
+    else:
+        query = query.filter(model.epa_window_closes >= today)
+    return query.order_by(model.epa_window_closes, model.id)
+
+
+def stalled_records(stalled_days, model=ApprenticeRecord):
+    """Open records whose status has not changed for more than stalled_days days."""
+    cutoff = date.today() - timedelta(days=stalled_days)
+    return model.query.filter(
+        model.status_updated_date < cutoff,
+        model.status.isnot(None),
+        model.status.notin_(CLOSED_STATUSES)
+    ).order_by(model.status_updated_date, model.id)
+
+
+def bulk_update_records(query, values, model=ApprenticeRecord):
+    """Apply values to every record matched by query in one UPDATE statement.
+
+    Keeps the derived epa_window_closes and status_updated_date columns in step,
+    since a bulk UPDATE bypasses the model's before_update hooks.
+    Returns the number of rows affected.
+    """
+    values = dict(values)
+    if 'approved_for_epa' in values:
+        approved = values['approved_for_epa']
+        values['epa_window_closes'] = approved + timedelta(days=EPA_WINDOW_DAYS) if approved else None
+    if 'status' in values:
+        values['status_updated_date'] = case(
+            (or_(model.status.is_(None), model.status != values['status']), date.today()),
+            else_=model.status_updated_date
+        )
+    return query.order_by(None).update(values, synchronize_session=False)
+
+
+def _pct(part, whole):
+    return round(part / whole * 100, 1) if whole else 0
+
+
+def dashboard_metrics(query, model=ApprenticeRecord):
+    """Compute the dashboard KPIs for the records matched by query in a single aggregate."""
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    graded = and_(model.overall_grade.isnot(None), model.overall_grade != '')
+    has_window = and_(model.grade_date.isnot(None), model.approved_for_epa.isnot(None))
+    within = within_window_clause(model)
+    has_first = and_(model.first_attempt_date.isnot(None), model.approved_for_epa.isnot(None))
+    has_gateway = and_(model.gateway_submitted.isnot(None), model.approved_for_epa.isnot(None))
+    gateway_days = days_between(model.approved_for_epa, model.gateway_submitted)
+
+    row = query.order_by(None).with_entities(
+        func.count(model.id),
+        count_if(graded),
+        count_if(model.overall_grade == 'Distinction'),
+        count_if(model.overall_grade == 'Merit'),
+        count_if(model.overall_grade == 'Pass'),
+        count_if(model.overall_grade == 'Fail'),
+        count_if(has_window),
+        count_if(within),
+        count_if(has_first),
+        count_if(and_(has_first, model.first_attempt_date <= date_add_days(model.approved_for_epa, EPA_WINDOW_DAYS))),
+        func.avg(case((within, days_between(model.grade_date, model.approved_for_epa)))),
+        count_if(has_gateway),
+        # A span of 4 calendar days or fewer can never exceed 5 business days
+        count_if(and_(has_gateway, gateway_days <= 4)),
+    ).one()
+
+    (total_learners, total_graded, distinction_count, merit_count, pass_count, fail_count,
+     window_count, within_count, first_count, first_in_window, avg_days,
+     gateway_count, gateway_fast) = row
+
+    # Spans of 5-8 calendar days depend on where the weekend falls; anything
+    # longer is always more than 5 business days. Check the few ambiguous rows here.
+    ambiguous = query.order_by(None).filter(
+        has_gateway, gateway_days > 4, gateway_days < 9
+    ).with_entities(model.gateway_submitted, model.approved_for_epa).all()
+    gateway_fast += sum(1 for submitted, approved in ambiguous
+                        if count_business_days(submitted, approved) <= 5)
+
+    if total_graded > 0:
+        grade_dist = {
+            'distinction': _pct(distinction_count, total_graded),
+            'merit': _pct(merit_count, total_graded),
+            'pass': _pct(pass_count, total_graded),
+            'fail': _pct(fail_count, total_graded)
+        }
+        # Overall pass rate (Distinction + Merit + Pass)
+        pass_rate = _pct(distinction_count + merit_count + pass_count, total_graded)
+    else:
+        grade_dist = {'distinction': 0, 'merit': 0, 'pass': 0, 'fail': 0}
+        pass_rate = 0
+
+    within_window_pct = _pct(within_count, window_count)
+
+    return {
+        'total_learners': total_learners,
+        'grade_dist': grade_dist,
+        'pass_rate': pass_rate,
+        'within_window_pct': within_window_pct,
+        'beyond_window_pct': round(100 - within_window_pct, 1),
+        'first_attempt_in_window_pct': _pct(first_in_window, first_count),
+        # Average days to complete for those within 12 weeks (as percentage of 84-day window)
+        'avg_days_within_window': round(avg_days / EPA_WINDOW_DAYS * 100, 1) if avg_days is not None else 0,
+        'gateway_approval_pct': _pct(gateway_fast, gateway_count)
+    }
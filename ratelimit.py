@@ -0,0 +1,157 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from functools import wraps
+from flask import request, current_app, jsonify, flash, render_template
+from metrics import RATE_LIMITED
+from cache import private_store
+
+
+def parse_limit(value):
+    """Parse 'N/SECONDS' into (capacity, period): bursts of N, refilled evenly over SECONDS."""
+    capacity, period = value.split('/')
+    return int(capacity), float(period)
+
+
+def _take(tokens, updated_at, now, capacity, period):
+    """Refill for the time elapsed, then spend one token if there is one.
+
+    Returns (tokens left, seconds until a token is available or 0, time the bucket is full again).
+    """
+    rate = capacity / period
+    tokens = min(capacity, tokens + (now - updated_at) * rate)
+    retry_after = 0
+    if tokens >= 1:
+        tokens -= 1
+    else:
+        retry_after = (1 - tokens) / rate
+    return tokens, retry_after, now + (capacity - tokens) / rate
+
+
+class MemoryBuckets:
+    """Token buckets held in this process only."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        now = time.time()
+        with self.lock:
+            tokens, updated_at, _ = self.buckets.get(key, (capacity, now, now))
+            tokens, retry_after, full_at = _take(tokens, updated_at, now, capacity, period)
+            self.buckets[key] = (tokens, now, full_at)
+            # A full bucket is the same as no bucket, so those can go
+            if len(self.buckets) > 10000:
+                self.buckets = {k: v for k, v in self.buckets.items() if v[2] > now}
+        return retry_after
+
+
+class SQLiteBuckets:
+    """Token buckets shared by every worker on the host through a SQLite file in WAL mode."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        self.calls = 0
+
+    def _conn(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                ' key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)'
+            )
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, period):
+        conn = self._conn()
+        now = time.time()
+        # The write lock makes read, refill and spend atomic across workers
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?',
+                               (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            tokens, retry_after, full_at = _take(tokens, updated_at, now, capacity, period)
+            conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, full_at)'
+                         ' VALUES (?, ?, ?, ?)', (key, tokens, now, full_at))
+            self.calls += 1
+            if self.calls % self.PURGE_EVERY == 0:
+                # A full bucket is the same as no bucket
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at < ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return retry_after
+
+
+def init_ratelimit(app):
+    """Configure the login/registration rate limits and the store shared by the workers."""
+    app.config.setdefault('RATELIMIT_ENABLED', os.environ.get('RATELIMIT_ENABLED', '1') == '1')
+    app.config.setdefault('RATELIMIT_BACKEND', os.environ.get('RATELIMIT_BACKEND', 'sqlite'))
+    app.config.setdefault('RATELIMIT_PATH', os.environ.get(
+        'RATELIMIT_PATH', os.path.join(app.instance_path, 'ratelimit.sqlite')))
+    app.config.setdefault('RATELIMIT_SHM_PATH', os.environ.get(
+        'RATELIMIT_SHM_PATH', f'/dev/shm/da11-{os.getuid()}/ratelimit.sqlite'))
+    app.config.setdefault('RATELIMIT_IP', os.environ.get('RATELIMIT_IP', '20/60'))
+    app.config.setdefault('RATELIMIT_ACCOUNT', os.environ.get('RATELIMIT_ACCOUNT', '5/60'))
+
+    backend = app.config['RATELIMIT_BACKEND']
+    if backend == 'sqlite':
+        app.extensions['ratelimit'] = SQLiteBuckets(private_store(app.config['RATELIMIT_PATH']))
+    elif backend == 'shm':
+        app.extensions['ratelimit'] = SQLiteBuckets(private_store(app.config['RATELIMIT_SHM_PATH']))
+    else:
+        app.extensions['ratelimit'] = MemoryBuckets()
+
+
+def rate_limited(account=None, template=None):
+    """Limit POSTs to a view per client IP and per account, before the view does any hashing.
+
+    account returns the username/email the request is for. Refused requests get a
+    429 with Retry-After, as JSON, or as the given template with a flashed message.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'POST' or not current_app.config['RATELIMIT_ENABLED']:
+                return f(*args, **kwargs)
+
+            buckets = current_app.extensions['ratelimit']
+            checks = [('ip', request.remote_addr or 'unknown', current_app.config['RATELIMIT_IP'])]
+            identity = (account() or '').strip().lower() if account else ''
+            if identity:
+                checks.append(('account', identity, current_app.config['RATELIMIT_ACCOUNT']))
+
+            for scope, value, limit in checks:
+                digest = hashlib.sha1(value.encode()).hexdigest()
+                retry_after = buckets.take(f'{request.endpoint}:{scope}:{digest}', *parse_limit(limit))
+                if retry_after:
+                    RATE_LIMITED.labels(endpoint=request.endpoint, scope=scope).inc()
+                    return _too_many_requests(math.ceil(retry_after), template)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def _too_many_requests(retry_after, template):
+    message = f'Too many attempts. Please try again in {retry_after} seconds.'
+    if template:
+        flash(message, 'danger')
+        response = current_app.make_response((render_template(template), 429))
+    else:
+        response = current_app.make_response((jsonify({'success': False, 'message': message}), 429))
+    response.headers['Retry-After'] = str(retry_after)
+    return response
@@ -0,0 +1,281 @@
+import os
+import threading
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from database import db
+from models import ApprenticeRecord
+from queries import DATE_FILTERS, EPA_WINDOW_DAYS, combined_records, parse_date, ace360_id_ranges, _pct
+from versioning import data_version
+
+DATE_FIELDS = [
+    'gateway_submitted', 'approved_for_epa', 'project_start_date', 'project_deadline_date',
+    'first_attempt_date', 'second_attempt_date', 'grade_date',
+]
+CATEGORY_FIELDS = ['status', 'overall_grade']
+SNAPSHOT_FIELDS = ['id', 'ace360_id'] + CATEGORY_FIELDS + DATE_FIELDS
+
+# Per-worker snapshot plus the writes this worker has committed since it was built
+_state = {'snapshot': None, 'pending_ids': set(), 'pending_bumps': 0, 'stale': False}
+_lock = threading.Lock()
+
+
+def init_snapshot(app):
+    """Enable the columnar record snapshot when RECORD_SNAPSHOT_ENABLED is set."""
+    app.config.setdefault('RECORD_SNAPSHOT_ENABLED', os.environ.get('RECORD_SNAPSHOT_ENABLED') == '1')
+    if app.config['RECORD_SNAPSHOT_ENABLED'] and not event.contains(Session, 'after_flush', _track_flush):
+        event.listen(Session, 'after_flush', _track_flush)
+        event.listen(Session, 'do_orm_execute', _track_bulk_write)
+        event.listen(Session, 'after_commit', _publish_commit)
+        event.listen(Session, 'after_soft_rollback', _discard_pending)
+
+
+def snapshot_enabled():
+    return current_app.config.get('RECORD_SNAPSHOT_ENABLED', False)
+
+
+class RecordSnapshot:
+    """Columnar copy of every live and archived record, held in NumPy arrays.
+
+    Dates are datetime64[D] with NaT for missing values; status and grade are
+    int16 codes into self.categories, with -1 for missing values.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.categories = {field: [] for field in CATEGORY_FIELDS}
+        self.columns = self._to_columns(rows)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.columns.values())
+
+    def _encode(self, field, values):
+        categories = self.categories[field]
+        index = {value: code for code, value in enumerate(categories)}
+        codes = np.empty(len(values), dtype=np.int16)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            if value not in index:
+                index[value] = len(categories)
+                categories.append(value)
+            codes[i] = index[value]
+        return codes
+
+    def _to_columns(self, rows):
+        values = list(zip(*rows)) if rows else [()] * len(SNAPSHOT_FIELDS)
+        raw = dict(zip(SNAPSHOT_FIELDS, values))
+        columns = {
+            'id': np.array(raw['id'], dtype=np.int64),
+            'ace360_id': np.array(raw['ace360_id'], dtype=np.int64),
+        }
+        for field in CATEGORY_FIELDS:
+            columns[field] = self._encode(field, raw[field])
+        for field in DATE_FIELDS:
+            columns[field] = np.array(raw[field], dtype='datetime64[D]')
+        return columns
+
+    def patch(self, ids, rows):
+        """Replace the given record ids with rows, dropping any ids no longer present."""
+        keep = ~np.isin(self.columns['id'], np.fromiter(ids, dtype=np.int64, count=len(ids)))
+        added = self._to_columns(rows)
+        self.columns = {
+            field: np.concatenate([array[keep], added[field]])
+            for field, array in self.columns.items()
+        }
+
+    def code(self, field, value):
+        """Category code for value, or None when no record has it."""
+        try:
+            return self.categories[field].index(value)
+        except ValueError:
+            return None
+
+    def category_counts(self, field, mask):
+        """{value: count} of a categorical field over the masked records."""
+        counts = np.bincount(self.columns[field][mask] + 1, minlength=len(self.categories[field]) + 1)
+        result = {value: int(counts[code + 1]) for code, value in enumerate(self.categories[field])
+                  if counts[code + 1]}
+        if counts[0]:
+            result[None] = int(counts[0])
+        return result
+
+    def _within_window(self):
+        c = self.columns
+        return (c['grade_date'] <= c['approved_for_epa'] + np.timedelta64(EPA_WINDOW_DAYS, 'D'))
+
+    def filter_mask(self, args):
+        """Boolean mask equivalent to queries.filter_records, with the same active filters dict."""
+        c = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        active_filters = {}
+
+        ace360_search = args.get('ace360_id', '').strip()
+        if ace360_search:
+            ranges = ace360_id_ranges(ace360_search) or []
+            matches = np.zeros(len(self), dtype=bool)
+            for low, high in ranges:
+                matches |= (c['ace360_id'] >= low) & (c['ace360_id'] <= high)
+            mask &= matches
+            active_filters['ace360_id'] = ace360_search
+
+        for param, field in (('status', 'status'), ('grade', 'overall_grade')):
+            value = args.get(param)
+            if value:
+                code = self.code(field, value)
+                mask &= c[field] == code if code is not None else False
+                active_filters[param] = value
+
+        window_filter = args.get('window')
+        if window_filter:
+            if window_filter == 'Yes':
+                mask &= self._within_window()
+            elif window_filter == 'No':
+                has_window = ~np.isnat(c['grade_date']) & ~np.isnat(c['approved_for_epa'])
+                mask &= has_window & ~self._within_window()
+            else:
+                mask[:] = False
+            active_filters['window'] = window_filter
+
+        for filter_prefix, model_field in DATE_FILTERS:
+            for suffix, compare in (('from', np.greater_equal), ('to', np.less_equal)):
+                raw = args.get(f'{filter_prefix}_{suffix}')
+                parsed = parse_date(raw)
+                if parsed:
+                    mask &= compare(c[model_field], np.datetime64(parsed, 'D'))
+                    active_filters[f'{filter_prefix}_{suffix}'] = raw
+
+        return mask, active_filters
+
+    def dashboard_metrics(self, mask):
+        """Vectorized equivalent of queries.dashboard_metrics over the masked records."""
+        c = {field: array[mask] for field, array in self.columns.items()}
+        grades = {grade: self.code('overall_grade', grade) for grade in ('Distinction', 'Merit', 'Pass', 'Fail', '')}
+
+        def grade_count(grade):
+            return int(np.count_nonzero(c['overall_grade'] == grades[grade])) if grades[grade] is not None else 0
+
+        total_learners = len(c['id'])
+        total_graded = int(np.count_nonzero(c['overall_grade'] >= 0)) - grade_count('')
+        distinction_count, merit_count, pass_count, fail_count = (
+            grade_count(grade) for grade in ('Distinction', 'Merit', 'Pass', 'Fail')
+        )
+
+        approved = c['approved_for_epa']
+        closes = approved + np.timedelta64(EPA_WINDOW_DAYS, 'D')
+        has_approved = ~np.isnat(approved)
+        has_window = has_approved & ~np.isnat(c['grade_date'])
+        within = has_window & (c['grade_date'] <= closes)
+        has_first = has_approved & ~np.isnat(c['first_attempt_date'])
+        has_gateway = has_approved & ~np.isnat(c['gateway_submitted'])
+
+        within_days = (c['grade_date'][within] - approved[within]).astype(np.int64)
+        # count_business_days counts both ends, so busday_count needs an exclusive end date
+        business_days = np.busday_count(c['gateway_submitted'][has_gateway], approved[has_gateway] + 1)
+
+        if total_graded > 0:
+            grade_dist = {
+                'distinction': _pct(distinction_count, total_graded),
+                'merit': _pct(merit_count, total_graded),
+                'pass': _pct(pass_count, total_graded),
+                'fail': _pct(fail_count, total_graded)
+            }
+            pass_rate = _pct(distinction_count + merit_count + pass_count, total_graded)
+        else:
+            grade_dist = {'distinction': 0, 'merit': 0, 'pass': 0, 'fail': 0}
+            pass_rate = 0
+
+        within_window_pct = _pct(int(np.count_nonzero(within)), int(np.count_nonzero(has_window)))
+        avg_days = float(within_days.mean()) if len(within_days) else None
+
+        return {
+            'total_learners': total_learners,
+            'grade_dist': grade_dist,
+            'pass_rate': pass_rate,
+            'within_window_pct': within_window_pct,
+            'beyond_window_pct': round(100 - within_window_pct, 1),
+            'first_attempt_in_window_pct': _pct(
+                int(np.count_nonzero(has_first & (c['first_attempt_date'] <= closes))),
+                int(np.count_nonzero(has_first))
+            ),
+            'avg_days_within_window': round(avg_days / EPA_WINDOW_DAYS * 100, 1) if avg_days is not None else 0,
+            'gateway_approval_pct': _pct(int(np.count_nonzero(business_days <= 5)), len(business_days))
+        }
+
+    def days_between(self, end_field, start_field, mask):
+        """Days from start_field to end_field for masked records that have both dates."""
+        start, end = self.columns[start_field][mask], self.columns[end_field][mask]
+        both = ~np.isnat(start) & ~np.isnat(end)
+        return (end[both] - start[both]).astype(np.int64).astype(float)
+
+
+def _load_rows(ids=None):
+    model = combined_records()
+    query = select(*[getattr(model, field) for field in SNAPSHOT_FIELDS])
+    if ids is not None:
+        query = query.where(model.id.in_(sorted(ids)))
+    return db.session.execute(query).all()
+
+
+def current_snapshot():
+    """Return this worker's snapshot, patched or rebuilt if the records have changed.
+
+    Writes committed by this worker are patched in by id. Anything else that moved
+    the records data version (other workers, bulk UPDATE/DELETE) triggers a rebuild.
+    """
+    version, _ = data_version('records')
+    with _lock:
+        snapshot = _state['snapshot']
+        if snapshot is not None and snapshot.version != version:
+            if not _state['stale'] and version == snapshot.version + _state['pending_bumps']:
+                ids = _state['pending_ids']
+                if ids:
+                    snapshot.patch(ids, _load_rows(ids))
+                snapshot.version = version
+            else:
+                snapshot = None
+        if snapshot is None:
+            snapshot = RecordSnapshot(_load_rows(), version)
+        _state.update(snapshot=snapshot, pending_ids=set(), pending_bumps=0, stale=False)
+        return snapshot
+
+
+def _track_flush(session, flush_context):
+    # Mirrors versioning._bump_after_flush, which bumps the records version once per flush
+    touched = [
+        obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, ApprenticeRecord) and (obj not in session.dirty or session.is_modified(obj))
+    ]
+    if touched:
+        session.info['snapshot_ids'] = session.info.get('snapshot_ids', set()) | {obj.id for obj in touched}
+        session.info['snapshot_bumps'] = session.info.get('snapshot_bumps', 0) + 1
+
+
+def _track_bulk_write(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if any(mapper.class_ is ApprenticeRecord for mapper in orm_execute_state.all_mappers):
+        orm_execute_state.session.info['snapshot_stale'] = True
+
+
+def _publish_commit(session):
+    ids = session.info.pop('snapshot_ids', set())
+    bumps = session.info.pop('snapshot_bumps', 0)
+    stale = session.info.pop('snapshot_stale', False)
+    if ids or bumps or stale:
+        with _lock:
+            _state['pending_ids'] |= ids
+            _state['pending_bumps'] += bumps
+            _state['stale'] = _state['stale'] or stale
+
+
+def _discard_pending(session, previous_transaction):
+    if previous_transaction.parent is None:
+        for key in ('snapshot_ids', 'snapshot_bumps', 'snapshot_stale'):
+            session.info.pop(key, None)
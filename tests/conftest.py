@@ -0,0 +1,149 @@
+import os
+import sys
+import sqlite3
+import socketserver
+import tempfile
+import threading
+from datetime import datetime
+import pytest
+
+# The app reads its configuration from the environment at import time
+_tmp = tempfile.mkdtemp(prefix='da11-tests-')
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    CACHE_BACKEND='memory',
+    RATELIMIT_BACKEND='memory',
+    JINJA_BYTECODE_CACHE_DIR='',
+    PASSWORD_HASH_METHOD='pbkdf2:sha256:1000',
+)
+os.environ.pop('DATABASE_REPLICA_URL', None)
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, db, mail  # noqa: E402
+from models import User  # noqa: E402
+from database import REPLICA_BIND  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+
+ADMIN_PASSWORD = 'DA11Admin2024!'
+
+flask_app.config.update(TESTING=True, RATELIMIT_ENABLED=False, MAIL_DEFAULT_SENDER='noreply@example.com')
+mail.state.suppress = True
+mail.state.default_sender = 'noreply@example.com'
+
+
+@pytest.fixture
+def app():
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': ADMIN_PASSWORD})
+    return client
+
+
+@pytest.fixture
+def make_user(app):
+    """Create users with unique usernames and emails; returns their ids."""
+    counter = {'n': 0}
+
+    def make(**fields):
+        counter['n'] += 1
+        n = f"{os.getpid()}{counter['n']}{datetime.now():%H%M%S%f}"
+        values = dict(username=f'user{n}', email=f'user{n}@example.com', forename='Test', surname='User',
+                      job_title='Tester', user_created_date=datetime.now(), is_active=True,
+                      role='viewer', approval_status='approved')
+        values.update(fields)
+        password = values.pop('password', 'Password1!')
+        with app.app_context():
+            user = User(**values)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    return make
+
+
+@pytest.fixture
+def replica(app, tmp_path, monkeypatch):
+    """Attach a copy of the test database as the read replica; returns its engine.
+
+    Request it before admin_client so the login does not pin the browser to the primary.
+    """
+    monkeypatch.setitem(app.config, 'REPLICA_READ_YOUR_WRITES_SECONDS', 0)
+    path = tmp_path / 'replica.db'
+    with app.app_context():
+        with sqlite3.connect(db.engine.url.database) as source, sqlite3.connect(path) as target:
+            source.backup(target)
+        engine = create_engine(f'sqlite:///{path}')
+        engines = db.engines
+        engines[REPLICA_BIND] = engine
+    yield engine
+    engines.pop(REPLICA_BIND)
+    engine.dispose()
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Minimal SMTP server on localhost that records connections and delivered messages."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []
+        super().__init__(('127.0.0.1', 0), SMTPStubHandler)
+
+
+class SMTPStubHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 stub ready')
+        recipients = []
+        while line := self.rfile.readline().decode():
+            command = line[:4].upper()
+            if command == 'EHLO':
+                self.reply('250 stub')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while (data := self.rfile.readline().decode()) not in ('.\r\n', ''):
+                    body.append(data)
+                self.server.messages.append((recipients, ''.join(body)))
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    """Point Flask-Mail at an in-process SMTP stub, without TLS; returns the stub."""
+    server = SMTPStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    mail_state = app.extensions['mail']
+    for key, value in [('server', host), ('port', port), ('use_tls', False), ('suppress', False)]:
+        monkeypatch.setattr(mail_state, key, value)
+    monkeypatch.setitem(app.config, 'MAIL_SERVER', host)
+    monkeypatch.setitem(app.config, 'MAIL_PORT', port)
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,40 @@
+import io
+from datetime import date, datetime
+from database import db
+from models import ApprenticeRecord, ArchivedApprenticeRecord
+
+
+def test_upload_skips_archived_records(app, admin_client):
+    with app.app_context():
+        db.session.add(ArchivedApprenticeRecord(id=770001, ace360_id=770001, status='EPA Passed',
+                                                grade_date=date(2020, 1, 1), archived_at=datetime.now()))
+        db.session.commit()
+
+    sheet = 'ACE360 ID,Status\n770001,EPA Passed\n770002,Gateway Submitted\n'
+    response = admin_client.post('/upload', data={'file': (io.BytesIO(sheet.encode()), 'records.csv')},
+                                 follow_redirects=True)
+    assert b'1 records imported, 1 skipped' in response.data
+
+    with app.app_context():
+        assert ApprenticeRecord.query.filter_by(ace360_id=770001).count() == 0
+        assert ApprenticeRecord.query.filter_by(ace360_id=770002).count() == 1
+        ApprenticeRecord.query.filter_by(ace360_id=770002).delete()
+        ArchivedApprenticeRecord.query.filter_by(id=770001).delete()
+        db.session.commit()
+
+
+def test_bulk_update_by_filter_leaves_archived_records(app, admin_client):
+    with app.app_context():
+        db.session.add(ArchivedApprenticeRecord(id=770003, ace360_id=770003, status='EPA Passed',
+                                                grade_date=date(2020, 1, 1), archived_at=datetime.now()))
+        db.session.commit()
+
+    response = admin_client.post('/update-bulk', headers={'Accept': 'application/json'}, data={
+        'scope': 'filter', 'ace360_id': '770003', 'include_archived': '1', 'set_overall_grade': 'Merit'})
+    assert response.json['updated'] == 0
+    assert 'Archived records are not changed.' in response.json['message']
+
+    with app.app_context():
+        assert db.session.get(ArchivedApprenticeRecord, 770003).overall_grade is None
+        ArchivedApprenticeRecord.query.filter_by(id=770003).delete()
+        db.session.commit()
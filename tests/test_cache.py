@@ -0,0 +1,58 @@
+import os
+import pickle
+import stat
+import pytest
+from cache import cache, private_store, LRUBackend
+
+
+def test_private_store_creates_owner_only_file(tmp_path):
+    path = private_store(str(tmp_path / 'store' / 'cache.sqlite'))
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) & 0o077 == 0
+
+
+def test_private_store_tightens_an_existing_own_file(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    path.write_bytes(b'')
+    path.chmod(0o666)
+    private_store(str(path))
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_private_store_refuses_world_writable_directory(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    directory.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        private_store(str(directory / 'cache.sqlite'))
+
+
+@pytest.mark.skipif(os.getuid() != 0, reason='needs root to create a file owned by another user')
+def test_private_store_refuses_file_owned_by_someone_else(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    path.write_bytes(b'')
+    os.chown(path, 4242, 4242)
+    with pytest.raises(RuntimeError):
+        private_store(str(path))
+
+
+def test_cached_user_holds_no_secrets(app, admin_client):
+    assert isinstance(cache.backend, LRUBackend)
+    admin_client.get('/records')
+    entries = [pickle.loads(value) for key, (namespace, value, _) in cache.backend.entries.items()
+               if namespace == 'users' and '|user:' in key]
+    assert entries
+    for fields in entries:
+        assert isinstance(fields, dict)
+        assert not {'password_hash', 'activation_token', 'activation_token_expires'} & set(fields)
+
+
+def test_user_loaded_from_cache_still_reads_its_password_hash(app, make_user):
+    from app import load_user
+    user_id = make_user(password='Password1!')
+    with app.test_request_context():
+        load_user(str(user_id))
+    with app.test_request_context():
+        user = load_user(str(user_id))
+        assert user.check_password('Password1!')
+        assert user.role == 'viewer'
@@ -0,0 +1,62 @@
+from datetime import date
+import pytest
+from flask_mail import Connection
+from sqlalchemy import select
+from database import db
+from models import DigestLog, User
+from digest import send_daily_digest
+
+
+@pytest.fixture
+def digest_context(app):
+    with app.test_request_context():
+        db.session.query(DigestLog).delete()
+        db.session.commit()
+        yield app.extensions['mail']
+
+
+def logged_today():
+    with db.engine.connect() as conn:
+        return conn.execute(select(DigestLog.user_id).where(DigestLog.digest_date == date.today())).scalars().all()
+
+
+def test_digest_sends_over_one_connection_once_per_day(digest_context, make_user, smtp_server):
+    make_user(role='admin')
+    make_user(role='admin')
+    admins = User.query.filter_by(role='admin', is_active=True, deleted_account_date=None).count()
+
+    assert send_daily_digest(digest_context, 14, 30) == (admins, 0)
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == admins
+    assert all('Daily Digest' in body for _, body in smtp_server.messages)
+
+    assert send_daily_digest(digest_context, 14, 30) == (0, admins)
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == admins
+
+
+def test_admin_is_claimed_before_the_email_is_sent(digest_context, monkeypatch):
+    claimed_at_send = []
+    original_send = Connection.send
+
+    def send(conn, message, *args, **kwargs):
+        claimed_at_send.append(len(logged_today()))
+        return original_send(conn, message, *args, **kwargs)
+
+    monkeypatch.setattr(Connection, 'send', send)
+    sent, _ = send_daily_digest(digest_context, 14, 30)
+    assert claimed_at_send == list(range(1, sent + 1))
+
+
+def test_failed_send_releases_the_claim(digest_context, monkeypatch, request):
+    def fail(conn, message, *args, **kwargs):
+        raise ConnectionError('relay down')
+
+    monkeypatch.setattr(Connection, 'send', fail)
+    assert send_daily_digest(digest_context, 14, 30) == (0, 0)
+    assert logged_today() == []
+
+    monkeypatch.undo()
+    smtp_server = request.getfixturevalue('smtp_server')
+    sent, _ = send_daily_digest(digest_context, 14, 30)
+    assert sent == len(smtp_server.messages) >= 1
@@ -0,0 +1,39 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy.exc import OperationalError
+from database import db
+from metrics import track_export, _watch_pool
+
+
+def test_healthz_hides_database_errors(app, client, monkeypatch, capsys):
+    def broken_connect():
+        raise OperationalError('SELECT 1', {}, Exception('password authentication failed for user "da11"'))
+
+    with app.app_context():
+        monkeypatch.setattr(db.engine, 'connect', broken_connect)
+        response = client.get('/healthz')
+    assert response.status_code == 503
+    assert response.json == {'status': 'error', 'database': 'unavailable'}
+    assert 'password authentication failed' in capsys.readouterr().out
+
+
+def test_failed_export_is_still_timed():
+    def exports_timed():
+        return REGISTRY.get_sample_value('da11_export_duration_seconds_count', {'format': 'test'}) or 0
+
+    before = exports_timed()
+    with pytest.raises(RuntimeError):
+        with track_export('test'):
+            raise RuntimeError('render failed')
+    assert exports_timed() == before + 1
+
+
+def test_pool_gauges_cover_every_bind(app, client, replica):
+    _watch_pool(replica, 'replica')
+    client.get('/healthz')
+    assert REGISTRY.get_sample_value('da11_db_pool_checked_out', {'bind': 'primary'}) is not None
+
+    before = REGISTRY.get_sample_value('da11_db_pool_checked_out', {'bind': 'replica'})
+    with replica.connect():
+        assert REGISTRY.get_sample_value('da11_db_pool_checked_out', {'bind': 'replica'}) == before + 1
+    assert REGISTRY.get_sample_value('da11_db_pool_checked_out', {'bind': 'replica'}) == before
@@ -0,0 +1,43 @@
+from datetime import date, datetime
+from sqlalchemy import MetaData, insert, inspect, text
+from database import db
+from migrations import MigrationRunner, RebuildWithAutoincrement
+from models import ApprenticeRecord, ArchivedApprenticeRecord
+
+
+def create_without_autoincrement():
+    """Recreate apprentice_records as databases made before AUTOINCREMENT have it."""
+    old = ApprenticeRecord.__table__.to_metadata(MetaData())
+    old.dialect_options['sqlite']['autoincrement'] = False
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP TABLE apprentice_records'))
+        old.create(conn)
+
+
+def test_rebuild_stops_record_ids_being_reused(app):
+    with app.app_context():
+        create_without_autoincrement()
+        with db.engine.begin() as conn:
+            conn.execute(insert(ApprenticeRecord.__table__), [dict(id=1, ace360_id=880001)])
+            conn.execute(insert(ArchivedApprenticeRecord.__table__),
+                         [dict(id=50, ace360_id=880050, status='EPA Passed', archived_at=datetime.now())])
+
+        runner = MigrationRunner(batch_size=100)
+        RebuildWithAutoincrement('apprentice_records', shared_ids_with=['apprentice_records_archive']).run(runner, 8, 0)
+        RebuildWithAutoincrement('apprentice_records', shared_ids_with=['apprentice_records_archive']).run(runner, 8, 0)
+
+        with db.engine.connect() as conn:
+            ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = 'apprentice_records'"))
+        assert 'AUTOINCREMENT' in ddl
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('apprentice_records')}
+        assert {index.name for index in ApprenticeRecord.__table__.indexes} <= indexes
+
+        assert db.session.get(ApprenticeRecord, 1).ace360_id == 880001
+        record = ApprenticeRecord(ace360_id=880002, gateway_submitted=date.today())
+        db.session.add(record)
+        db.session.commit()
+        assert record.id == 51
+
+        db.session.query(ApprenticeRecord).filter(ApprenticeRecord.ace360_id.in_([880001, 880002])).delete()
+        db.session.query(ArchivedApprenticeRecord).filter_by(id=50).delete()
+        db.session.commit()
@@ -0,0 +1,185 @@
+import io
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import zipfile
+import pytest
+from flask_mail import Connection
+from prometheus_client import REGISTRY
+from exports import build_xlsx, stream_partitioned_zip
+import offload
+from offload import process_context, render_in_pool
+from conftest import ADMIN_PASSWORD
+
+
+def test_render_pool_uses_a_clean_start_method(app):
+    assert process_context.get_start_method() in ('forkserver', 'spawn')
+    with app.app_context():
+        output = render_in_pool(build_xlsx, ['ACE360 ID'], [[1], [2]])
+    assert output[:2] == b'PK'
+
+
+def test_xlsx_and_pdf_exports_render_in_the_pool(admin_client):
+    for fmt, magic in [('xlsx', b'PK'), ('pdf', b'%PDF')]:
+        response = admin_client.get(f'/export/{fmt}')
+        assert response.status_code == 200
+        assert response.data.startswith(magic)
+
+
+def test_zip_partitions_share_the_render_pool(app):
+    partitions = {f'part {n}': [[n]] for n in range(5)}
+    with app.app_context():
+        archive = b''.join(stream_partitioned_zip(['ACE360 ID'], partitions, 'csv', max_in_flight=2))
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert sorted(zf.namelist()) == [f'part_{n}.csv' for n in range(5)]
+        assert zf.read('part_3.csv').decode().splitlines() == ['ACE360 ID', '3']
+
+
+def test_zip_entry_names_are_unique(app):
+    partitions = {'EPA Passed': [[1]], 'EPA/Passed': [[2]], 'EPA-Passed!': [[3]], 'Évalué': [[4]], '日本': [[5]]}
+    with app.app_context():
+        archive = b''.join(stream_partitioned_zip(['ACE360 ID'], partitions, 'csv', max_in_flight=2))
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        contents = {name: zf.read(name).decode().splitlines()[1] for name in zf.namelist()}
+    assert len(contents) == len(partitions)
+    assert contents == {'EPA_Passed.csv': '1', 'EPA_Passed_2.csv': '2', 'EPA-Passed.csv': '3',
+                        'Evalue.csv': '4', 'partition-5.csv': '5'}
+
+
+def test_zip_export_route_streams(admin_client):
+    response = admin_client.get('/export/zip', query_string={'partition_by': 'status', 'format': 'xlsx'})
+    assert response.status_code == 200
+    zipfile.ZipFile(io.BytesIO(response.data)).testzip()
+
+
+SLOW_RENDER_SECONDS = 0.5
+
+
+def slow_build(headers, rows):
+    time.sleep(SLOW_RENDER_SECONDS)
+    return build_xlsx(headers, rows)
+
+
+def test_exports_render_side_by_side_while_pages_are_served(app, admin_client, monkeypatch):
+    # A fresh two-process pool, whatever this machine's default
+    monkeypatch.setitem(app.config, 'EXPORT_RENDER_WORKERS', 2)
+    monkeypatch.setitem(offload._pools, 'render', None)
+    outputs = []
+
+    def export():
+        with app.app_context():
+            outputs.append(render_in_pool(slow_build, ['ACE360 ID'], [[1]]))
+
+    with app.app_context():
+        # Start both processes before timing
+        for future in [offload.submit_render(slow_build, ['ACE360 ID'], [[1]]) for _ in range(2)]:
+            future.result()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=export) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    page_started = time.perf_counter()
+    assert admin_client.get('/').status_code == 200
+    page_elapsed = time.perf_counter() - page_started
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    offload._pools['render'].shutdown()
+
+    assert [output[:2] for output in outputs] == [b'PK'] * 4
+    # Two at a time: well under the serial time, but never more than two at once
+    assert 2 * SLOW_RENDER_SECONDS <= elapsed < 3 * SLOW_RENDER_SECONDS
+    assert page_elapsed < SLOW_RENDER_SECONDS
+
+
+UNGUARDED_SCRIPT = '''
+import io, sys, zipfile
+sys.path.insert(0, {root!r})
+from app import app
+from exports import build_xlsx, stream_partitioned_zip
+from offload import render_in_pool
+with app.app_context():
+    print('xlsx', render_in_pool(build_xlsx, ['ACE360 ID'], [[1]])[:2])
+    archive = b''.join(stream_partitioned_zip(['ACE360 ID'], {{'a': [[1]], 'b': [[2]]}}, 'xlsx', 2))
+    print('zip', sorted(zipfile.ZipFile(io.BytesIO(archive)).namelist()))
+'''
+
+
+def test_scripts_without_a_main_guard_render_in_process(tmp_path):
+    script = tmp_path / 'export_script.py'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script.write_text(textwrap.dedent(UNGUARDED_SCRIPT.format(root=root)))
+    result = subprocess.run([sys.executable, str(script)], cwd=tmp_path, capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert 'rendering and hashing in-process' in result.stdout
+    assert "xlsx b'PK'" in result.stdout
+    assert "zip ['a.xlsx', 'b.xlsx']" in result.stdout
+
+
+SLOW_SEND_SECONDS = 0.2
+
+
+@pytest.fixture
+def slow_mail(app, monkeypatch):
+    sent = []
+
+    def send(conn, message):
+        time.sleep(SLOW_SEND_SECONDS)
+        sent.append(message.recipients[0])
+
+    monkeypatch.setattr(Connection, 'send', send)
+    return sent
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_approvals_do_not_wait_on_a_slow_mail_server(app, make_user, slow_mail):
+    pending = [make_user(approval_status='pending', is_active=False) for _ in range(6)]
+
+    def approve(user_ids):
+        client = app.test_client()
+        client.post('/login', data={'username': 'admin', 'password': ADMIN_PASSWORD})
+        for user_id in user_ids:
+            response = client.post(f'/admin/notifications/approve/{user_id}')
+            assert response.json['message'] == 'Approved. Activation email queued.'
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=approve, args=(pending[i::3],)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # Sending inline, the six SMTP round trips alone would take 1.2 seconds
+    assert elapsed < len(pending) * SLOW_SEND_SECONDS / 2
+    assert wait_for(lambda: len(slow_mail) == len(pending))
+
+
+def test_background_send_failures_are_counted_and_logged(app, admin_client, make_user, monkeypatch, capsys):
+    def fail(conn, message):
+        raise ConnectionError('relay down')
+
+    monkeypatch.setattr(Connection, 'send', fail)
+    failures = REGISTRY.get_sample_value('da11_email_failures_total') or 0
+    user_id = make_user(approval_status='pending', is_active=False)
+    admin_client.post(f'/admin/notifications/reject/{user_id}')
+
+    assert wait_for(lambda: REGISTRY.get_sample_value('da11_email_failures_total') == failures + 1)
+
+    output = []
+
+    def logged_with_route():
+        output.append(capsys.readouterr().out)
+        return 'Email error in reject_registration' in ''.join(output)
+
+    assert wait_for(logged_with_route)
@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+import pytest
+from models import ApprenticeRecord
+from database import db
+from queries import ace360_id_ranges, ACE360_ID_MAX
+
+
+def test_exact_and_prefix_ranges():
+    assert ace360_id_ranges('123') == [(123, 123)]
+    assert ace360_id_ranges('123*')[:3] == [(123, 123), (1230, 1239), (12300, 12399)]
+
+
+def test_zero_prefix_is_exact_zero():
+    assert ace360_id_ranges('0*') == [(0, 0)]
+
+
+@pytest.mark.parametrize('search', ['99999999999999999999', str(ACE360_ID_MAX + 1), '²', '1²*', '01*', 'abc', ''])
+def test_invalid_searches_return_none(search):
+    assert ace360_id_ranges(search) is None
+
+
+@pytest.mark.parametrize('search', ['99999999999999999999', '²', '0*'])
+def test_records_search_handles_edge_cases(admin_client, search):
+    response = admin_client.get('/records', query_string={'ace360_id': search})
+    assert response.status_code in (200, 302)
+    response = admin_client.get('/api/records', query_string={'ace360_id': search})
+    assert response.status_code == 200
+
+
+def test_worklist_api_is_paginated(app, admin_client):
+    # Approved 80 days ago, so the 12-week window closes in 4 days
+    approved = date.today() - timedelta(days=80)
+    with app.app_context():
+        db.session.add_all([ApprenticeRecord(ace360_id=660001 + n, approved_for_epa=approved) for n in range(3)])
+        db.session.commit()
+
+    first = admin_client.get('/api/worklist', query_string={'per_page': 2}).json
+    assert len(first['records']) == 2
+    assert first['total'] >= 3
+    assert first['pages'] == (first['total'] + 1) // 2
+
+    seen = set()
+    for page in range(1, first['pages'] + 1):
+        response = admin_client.get('/api/worklist', query_string={'per_page': 2, 'page': page}).json
+        seen.update(r['ace360_id'] for r in response['records'])
+    assert {660001, 660002, 660003} <= seen
+    assert len(seen) == first['total']
+
+    capped = admin_client.get('/api/worklist', query_string={'per_page': 1000}).json
+    assert len(capped['records']) == min(capped['total'], 100)
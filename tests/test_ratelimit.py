@@ -0,0 +1,50 @@
+import threading
+import time
+import numpy as np
+import pytest
+from ratelimit import MemoryBuckets
+
+
+@pytest.fixture
+def rate_limits(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setitem(app.extensions, 'ratelimit', MemoryBuckets())
+
+
+def test_login_flood_is_refused_with_retry_after(app, rate_limits):
+    client = app.test_client()
+    statuses = []
+    for _ in range(10):
+        response = client.post('/login', data={'username': 'admin', 'password': 'WrongPassword1!'})
+        statuses.append(response.status_code)
+    assert statuses[:5] == [200] * 5
+    assert statuses[5:] == [429] * 5
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_dashboard_stays_responsive_during_a_login_flood(app, admin_client, rate_limits):
+    stop = threading.Event()
+    refused = []
+
+    def flood():
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post('/login', data={'username': 'admin', 'password': 'WrongPassword1!'})
+            refused.append(response.status_code == 429 and 'Retry-After' in response.headers)
+
+    threads = [threading.Thread(target=flood) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    try:
+        for _ in range(50):
+            started = time.perf_counter()
+            assert admin_client.get('/').status_code == 200
+            latencies.append(time.perf_counter() - started)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    assert sum(refused) > len(refused) / 2
+    assert np.percentile(latencies, 95) < 0.5
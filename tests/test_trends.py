@@ -0,0 +1,94 @@
+from datetime import date
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import analytics
+from database import db
+from models import ApprenticeRecord, TrendMonth
+from analytics import monthly_trends
+from cache import cache
+
+
+def test_missing_months_are_computed_on_the_primary(app, request):
+    with app.app_context():
+        record = ApprenticeRecord(ace360_id=990001, approved_for_epa=date(2001, 3, 1), overall_grade='Pass',
+                                  grade_date=date(2001, 4, 1))
+        db.session.add(record)
+        db.session.commit()
+        record_id = record.id
+
+        # The replica is a copy taken before the grade was corrected on the primary
+        request.getfixturevalue('replica')
+        record.overall_grade = 'Fail'
+        db.session.query(TrendMonth).delete()
+        db.session.commit()
+
+        with app.test_request_context('/trends'):
+            g._use_replica = True
+            trends = {entry['month']: entry for entry in monthly_trends()}
+            db.session.remove()
+
+        assert trends['2001-03']['pass_rate'] == 0
+        stored = db.session.get(TrendMonth, '2001-03')
+        assert '"pass_rate": 0' in stored.payload
+        db.session.delete(db.session.get(ApprenticeRecord, record_id))
+        db.session.commit()
+
+
+def test_pipeline_reads_stay_on_the_replica(app, replica, admin_client):
+    record_queries = {'primary': 0, 'replica': 0}
+
+    def counter(name):
+        def count(conn, cursor, statement, *args):
+            if 'apprentice_records' in statement:
+                record_queries[name] += 1
+        return count
+
+    with app.app_context():
+        primary = db.engine
+    listeners = [(primary, counter('primary')), (replica, counter('replica'))]
+    for engine, listener in listeners:
+        event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        cache.invalidate('analytics')
+        response = admin_client.get('/api/analytics/pipeline')
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+    assert response.status_code == 200
+    assert record_queries['replica'] > 0
+    assert record_queries['primary'] == 0
+
+
+def test_months_computed_across_a_write_are_not_stored(app, monkeypatch):
+    with app.app_context():
+        record = ApprenticeRecord(ace360_id=990002, approved_for_epa=date(2001, 5, 1), overall_grade='Pass',
+                                  grade_date=date(2001, 6, 1))
+        db.session.add(record)
+        db.session.commit()
+        record_id = record.id
+        db.session.query(TrendMonth).delete()
+        db.session.commit()
+
+        compute_months = analytics._compute_months
+
+        def compute_then_write(months):
+            computed = compute_months(months)
+            # Another request regrades the record after the figures were read
+            with Session(db.engine) as other:
+                other.get(ApprenticeRecord, record_id).overall_grade = 'Fail'
+                other.commit()
+            return computed
+
+        monkeypatch.setattr(analytics, '_compute_months', compute_then_write)
+        with app.test_request_context('/trends'):
+            monthly_trends()
+        monkeypatch.undo()
+
+        assert db.session.get(TrendMonth, '2001-05') is None
+        trends = {entry['month']: entry for entry in monthly_trends()}
+        assert trends['2001-05']['pass_rate'] == 0
+        assert db.session.get(TrendMonth, '2001-05') is not None
+        db.session.delete(db.session.get(ApprenticeRecord, record_id))
+        db.session.commit()
@@ -0,0 +1,32 @@
+import io
+import time
+from werkzeug.security import check_password_hash
+from models import User
+
+
+def test_import_hashes_passwords_in_the_process_pool(app, admin_client):
+    sheet = ('Forename,Surname,Email,Job Title,Password\n'
+             'Ada,Import,ada.import@example.com,Tester,Imported1!\n'
+             'Bob,Import,bob.import@example.com,Tester,Imported2!\n')
+    response = admin_client.post('/admin/users/import',
+                                 data={'file': (io.BytesIO(sheet.encode()), 'users.csv')})
+    assert response.status_code == 200
+    assert response.json['created'] == 2
+    with app.app_context():
+        user = User.query.filter_by(email='bob.import@example.com').one()
+        assert check_password_hash(user.password_hash, 'Imported2!')
+
+
+def test_import_emails_go_through_the_email_pool_on_one_connection(app, admin_client, smtp_server):
+    sheet = 'Forename,Surname,Email,Job Title,Password\n' + ''.join(
+        f'User,Batch,batch{n}@example.com,Tester,Imported{n}!\n' for n in range(3))
+    response = admin_client.post('/admin/users/import',
+                                 data={'file': (io.BytesIO(sheet.encode()), 'batch.csv')})
+    assert response.json['created'] == 3
+
+    deadline = time.time() + 5
+    while len(smtp_server.messages) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sorted(recipients[0] for recipients, _ in smtp_server.messages) == [
+        f'batch{n}@example.com' for n in range(3)]
+    assert smtp_server.connections == 1
@@ -0,0 +1,32 @@
+from database import db
+from models import User
+from versioning import data_version
+from conftest import ADMIN_PASSWORD
+
+
+def users_version(app):
+    with app.app_context():
+        return data_version('users')[0]
+
+
+def test_login_keeps_user_pages_cached(app, admin_client, make_user):
+    make_user(username='etaglogin', password='Password1!')
+    admin_client.get('/')  # shows the login flash message, which pages are not cached with
+    etag = admin_client.get('/').headers['ETag']
+    version = users_version(app)
+
+    app.test_client().post('/login', data={'username': 'etaglogin', 'password': 'Password1!'})
+    app.test_client().post('/login', data={'username': 'admin', 'password': ADMIN_PASSWORD})
+
+    assert users_version(app) == version
+    assert admin_client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_other_user_changes_still_bump(app, make_user):
+    user_id = make_user()
+    version = users_version(app)
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.job_title = 'Lead'
+        db.session.commit()
+    assert users_version(app) == version + 1
@@ -0,0 +1,139 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from datetime import datetime, timedelta
+import pandas as pd
+from flask import render_template, url_for, current_app
+from flask_mail import Message
+from sqlalchemy import insert, select
+from database import db
+from models import User
+from passwords import hash_password, is_strong_password
+from offload import process_context, processes_usable, processes_broken
+
+# Upload column -> User field; Telephone and Role are optional
+USER_IMPORT_COLUMNS = {
+    'Forename': 'forename',
+    'Surname': 'surname',
+    'Email': 'email',
+    'Job Title': 'job_title',
+    'Telephone': 'telephone',
+    'Role': 'role',
+    'Password': 'password',
+}
+REQUIRED_COLUMNS = ['Forename', 'Surname', 'Email', 'Job Title', 'Password']
+
+
+def init_user_import(app):
+    """Configure the process pool size used to hash imported passwords."""
+    app.config.setdefault('USER_IMPORT_WORKERS',
+                          int(os.environ.get('USER_IMPORT_WORKERS', min(4, os.cpu_count() or 1))))
+
+
+def read_user_rows(df):
+    """Validate an uploaded user sheet. Returns (rows, errors) with one error string per rejected line."""
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        return [], [f"Missing column(s): {', '.join(missing)}"]
+
+    rows, errors, seen_emails = [], [], set()
+    for line, record in enumerate(df.to_dict('records'), start=2):
+        row = {
+            field: str(record[column]).strip() if column in record and not pd.isna(record[column]) else ''
+            for column, field in USER_IMPORT_COLUMNS.items()
+        }
+        row['role'] = row['role'].lower() or 'viewer'
+        if not all(row[USER_IMPORT_COLUMNS[column]] for column in REQUIRED_COLUMNS):
+            errors.append(f'Line {line}: all required fields must be filled.')
+        elif row['role'] not in ('admin', 'viewer'):
+            errors.append(f"Line {line}: invalid role '{row['role']}'.")
+        elif not is_strong_password(row['password']):
+            errors.append(f'Line {line}: password does not meet security requirements.')
+        elif row['email'].lower() in seen_emails:
+            errors.append(f"Line {line}: {row['email']} appears more than once.")
+        else:
+            seen_emails.add(row['email'].lower())
+            rows.append((line, row))
+    return rows, errors
+
+
+def import_users(rows, serializer, max_workers):
+    """Create approved, not yet activated accounts for the rows in one bulk insert.
+
+    Existing usernames and emails are read in a single query, and the password
+    hashes are computed in a process pool. Returns (created user dicts, errors).
+    """
+    existing = db.session.execute(select(User.username, User.email)).all()
+    taken_usernames = {username for username, _ in existing}
+    taken_emails = {email.lower() for _, email in existing}
+
+    errors = []
+    new_rows = []
+    for line, row in rows:
+        if row['email'].lower() in taken_emails:
+            errors.append(f"Line {line}: {row['email']} is already registered.")
+        else:
+            new_rows.append(row)
+    if not new_rows:
+        return [], errors
+
+    # Hashing dominates the import, so spread it across processes. They have no
+    # app context, so the configured settings are passed along.
+    passwords = [row['password'] for row in new_rows]
+    hasher = partial(hash_password, method=current_app.config['PASSWORD_HASH_METHOD'],
+                     salt_length=current_app.config['PASSWORD_SALT_LENGTH'])
+    hashes = None
+    if processes_usable():
+        try:
+            with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(passwords))),
+                                     mp_context=process_context) as pool:
+                hashes = list(pool.map(hasher, passwords,
+                                       chunksize=max(1, len(passwords) // (max_workers * 4))))
+        except BrokenProcessPool as error:
+            processes_broken(error)
+    if hashes is None:
+        hashes = [hasher(password) for password in passwords]
+
+    now = datetime.now()
+    users = []
+    for row, password_hash in zip(new_rows, hashes):
+        # Same username scheme as /register, resolved against the set instead of a query per try
+        base_username = row['email'].split('@')[0]
+        username, counter = base_username, 1
+        while username in taken_usernames:
+            username = f'{base_username}{counter}'
+            counter += 1
+        taken_usernames.add(username)
+
+        users.append({
+            'username': username,
+            'email': row['email'],
+            'password_hash': password_hash,
+            'forename': row['forename'],
+            'surname': row['surname'],
+            'job_title': row['job_title'],
+            'telephone': row['telephone'] or None,
+            'user_created_date': now,
+            'is_active': False,
+            'role': row['role'],
+            'approval_status': 'approved',
+            'activation_token': serializer.dumps(row['email'], salt='account-activation-salt'),
+            'activation_token_expires': now + timedelta(hours=48),
+        })
+
+    db.session.execute(insert(User), users)
+    db.session.commit()
+    return users, errors
+
+
+def activation_messages(users):
+    """Build the activation email for each imported user. Needs a request context for the links."""
+    messages = []
+    for user in users:
+        activation_url = url_for('activate_account', token=user['activation_token'], _external=True)
+        msg = Message('Activate Your DA1.1 Tracker Account', recipients=[user['email']])
+        msg.html = render_template('emails/activation.html', forename=user['forename'], activation_url=activation_url)
+        msg.body = render_template('emails/activation.txt', forename=user['forename'], activation_url=activation_url)
+        messages.append(msg)
+    return messages
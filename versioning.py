@@ -0,0 +1,88 @@
+from datetime import datetime
+from sqlalchemy import event, inspect, update, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import db
+from models import ApprenticeRecord, User, DataVersion
+
+# Version namespaces and the models whose writes bump them
+TRACKED_MODELS = {
+    ApprenticeRecord: 'records',
+    User: 'users',
+}
+
+# Columns no versioned response shows, so a flush that only changes these (a
+# login stamping its time or upgrading a hash) keeps every cached page valid
+UNVERSIONED_COLUMNS = {
+    User: {'date_last_logged_in', 'password_hash'},
+}
+
+
+def init_versioning(app):
+    """Create the version rows and hook every session so writes bump them."""
+    with app.app_context():
+        for name in set(TRACKED_MODELS.values()):
+            if db.session.get(DataVersion, name) is None:
+                db.session.add(DataVersion(name=name, version=0, updated_at=datetime.now()))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker seeded the rows first
+            db.session.rollback()
+
+    if not event.contains(Session, 'after_flush', _bump_after_flush):
+        event.listen(Session, 'after_flush', _bump_after_flush)
+        event.listen(Session, 'do_orm_execute', _bump_on_bulk_write)
+
+
+def data_version(name):
+    """Return (version, updated_at) for a namespace, read straight from the database."""
+    row = db.session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.name == name)
+    ).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+def locked_version(session, name):
+    """Return a namespace's version, locking its row until the session's transaction ends.
+
+    Callers holding the lock are ordered against each other and against bump(),
+    which waits for it. SQLite has no row locks but serialises writers anyway.
+    """
+    return session.connection().execute(
+        select(DataVersion.version).where(DataVersion.name == name).with_for_update()
+    ).scalar()
+
+
+def bump(session, names):
+    """Increment the given namespaces inside the session's current transaction."""
+    if not names:
+        return
+    table = DataVersion.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c.name.in_(sorted(names)))
+        .values(version=table.c.version + 1, updated_at=datetime.now())
+    )
+
+
+def _bump_after_flush(session, flush_context):
+    names = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = TRACKED_MODELS.get(type(obj))
+        if name and (obj not in session.dirty or _versioned_change(obj)):
+            names.add(name)
+    bump(session, names)
+
+
+def _versioned_change(obj):
+    skipped = UNVERSIONED_COLUMNS.get(type(obj), set())
+    return any(attr.history.has_changes() for attr in inspect(obj).attrs if attr.key not in skipped)
+
+
+def _bump_on_bulk_write(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    names = {TRACKED_MODELS[m.class_] for m in orm_execute_state.all_mappers if m.class_ in TRACKED_MODELS}
+    bump(orm_execute_state.session, names)